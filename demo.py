@@ -120,10 +120,9 @@ async def run_demo(n_turns, noise_ratio):
                 break
     else:
         # Offline Injection
-        for i, text in enumerate(stream):
-            await sys.process_turn(text)
-            if (i+1) % 100 == 0:
-                print(f"  Processed {i+1}/{n_turns}...", end='\r')
+        for i in range(0, len(stream), batch_size):
+            await sys.ingest_many(stream[i : i + batch_size])
+            print(f"  Processed {min(i + batch_size, n_turns)}/{n_turns}...", end='\r')
 
     duration = time.time() - start_time
     print(f"\n✅ Seeding Complete in {duration:.2f}s")
@@ -6,10 +6,11 @@ echo "🚀 Starting Backend on http://127.0.0.1:8000..."
 uvicorn server:app --host 127.0.0.1 --port 8000 > backend.log 2>&1 &
 BACKEND_PID=$!
 
-# Wait for Backend to initialize (Loop until port 8000 is open)
+# Wait for Backend to be live (/healthz answers while the index is still loading;
+# /readyz turns 200 once memories are queryable)
 echo "⏳ Waiting for backend to start..."
 for i in {1..120}; do
-    if curl -s http://127.0.0.1:8000 > /dev/null; then
+    if curl -sf http://127.0.0.1:8000/healthz > /dev/null; then
         echo "✅ Backend is UP!"
         break
     fi
@@ -22,7 +23,7 @@ for i in {1..120}; do
 done
 
 # Check if backend failed to start (Timeout or Crash)
-if ! curl -s http://127.0.0.1:8000 > /dev/null; then
+if ! curl -sf http://127.0.0.1:8000/healthz > /dev/null; then
     echo "❌ Backend FAILED to start (Timeout or Crash). Showing logs:"
     cat backend.log
     exit 1
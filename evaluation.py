@@ -173,8 +173,9 @@ async def run_benchmark():
     
     print("\n✅ Benchmark Complete. Metrics saved to artifacts/metrics.json")
     
-    # Cleanup
-    sys.store.conn.close()
+    # Cleanup (close() flushes usage stats and stops the background threads)
+    sys.close()
+    sys.drop_snapshot()
     try:
         if os.path.exists(test_db_path):
             os.remove(test_db_path)
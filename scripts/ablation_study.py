@@ -34,9 +34,11 @@ async def main():
     
     cfg_base = copy.deepcopy(cfg)
     cfg_base["memory"]["rerank"] = False
+    cfg_base["memory"].setdefault("lexical", {})["enabled"] = False
     await score(cfg_base, conv, "Baseline (Semantic only)")
     
     cfg_hybrid = copy.deepcopy(cfg)
+    cfg_hybrid["memory"]["rerank"] = False
     await score(cfg_hybrid, conv, "+ Hybrid BM25 + Semantic")
     
     await score(copy.deepcopy(cfg), conv, "+ Multi-signal Reranking")
@@ -0,0 +1,44 @@
+import argparse
+import asyncio
+import json
+import time
+from neurohack_memory import MemorySystem
+from neurohack_memory.utils import load_yaml
+
+def fresh_system(path):
+    cfg = load_yaml("config.yaml")
+    cfg.setdefault("storage", {})["path"] = path
+    sys = MemorySystem(cfg)
+    sys.clear()
+    return sys
+
+async def main(args):
+    with open("data/synth_1200.json") as f:
+        texts = [item["user"] for item in json.load(f)][:args.turns]
+
+    print("\n" + "="*60)
+    print(f"INGEST THROUGHPUT ({len(texts)} turns)")
+    print("="*60)
+
+    sys = fresh_system("artifacts/bench_ingest_loop.sqlite")
+    t = time.perf_counter()
+    for text in texts:
+        await sys.process_turn(text)
+    base = len(texts) / (time.perf_counter() - t)
+    print(f"  process_turn loop       | {base:8.1f} turns/s")
+    sys.close()
+
+    for concurrency in args.concurrency:
+        sys = fresh_system("artifacts/bench_ingest_pipeline.sqlite")
+        t = time.perf_counter()
+        await sys.ingest_many(texts, concurrency=concurrency, batch_turns=args.batch_turns)
+        rps = len(texts) / (time.perf_counter() - t)
+        print(f"  ingest_many x{concurrency:<3}        | {rps:8.1f} turns/s (x{rps / base:.2f})")
+        sys.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Turns/s of the ingest pipeline vs one process_turn at a time")
+    parser.add_argument("--turns", type=int, default=300)
+    parser.add_argument("--batch-turns", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8, 16])
+    asyncio.run(main(parser.parse_args()))
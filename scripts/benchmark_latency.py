@@ -30,8 +30,7 @@ async def benchmark(cfg, n_turns):
             source_text="benchmark"
         ))
     
-    sys.store.upsert_many(dummy_memories)
-    sys.vindex.add_or_update(dummy_memories)
+    sys._persist_memories(dummy_memories)
     sys.turn = n_turns
     
     # Now measure retrieval latency
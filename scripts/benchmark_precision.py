@@ -0,0 +1,53 @@
+import json
+import faiss
+from neurohack_memory.vector_index import VectorIndex
+from neurohack_memory.types import MemoryEntry, MemoryType
+from neurohack_memory.utils import load_yaml
+
+DATASETS = ["data/synth_1200.json", "data/adversarial_dataset.json"]
+PRECISIONS = ["float32", "float16", "int8"]
+
+def build(cfg, conv, precision):
+    vi = VectorIndex(cfg["vector"]["embedding_model"], precision=precision)
+    # Every turn becomes a memory so the index is big enough to measure
+    mems = [MemoryEntry(
+        memory_id=f"turn_{item['turn']}",
+        type=MemoryType.fact,
+        key=f"turn_{item['turn']}",
+        value=item["user"],
+        source_turn=item["turn"],
+        confidence=0.9,
+        source_text=item["user"],
+    ) for item in conv]
+    vi.add_or_update(mems)
+    return vi
+
+def bytes_per_vector(vi):
+    return len(faiss.serialize_index(vi.index)) / max(len(vi), 1)
+
+def main():
+    cfg = load_yaml("config.yaml")
+    k = cfg["evaluation"]["recall_k"]
+
+    print("\n" + "="*60)
+    print(f"PRECISION BENCHMARK (recall@{k} vs float32)")
+    print("="*60)
+
+    for path in DATASETS:
+        with open(path) as f:
+            conv = json.load(f)
+        queries = [item["user"] for item in conv]
+        print(f"\n{path} ({len(conv)} memories, {len(queries)} queries)")
+
+        reference = None
+        for precision in PRECISIONS:
+            vi = build(cfg, conv, precision)
+            # search() over-fetches top_k*5; keep the top k for recall@k
+            results = [[mid for mid, _ in hits[:k]] for hits in vi.search_many(queries, top_k=k)]
+            if reference is None:
+                reference = results
+            recall = sum(len(set(r) & set(ref)) for r, ref in zip(results, reference)) / (k * len(queries))
+            print(f"  {precision:8} | recall@{k}: {recall:.4f} (delta {recall - 1.0:+.4f}) | {bytes_per_vector(vi):7.1f} bytes/vector")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import urllib.request
+from neurohack_memory import MemorySystem
+from neurohack_memory.utils import load_yaml
+
+QUERIES = [
+    "When can I call?",
+    "What is my favorite color?",
+    "remind me of my constraints",
+    "what language do I prefer?",
+    "what is my secret code?",
+    "do I work on sundays?",
+]
+CONCURRENCY = [1, 2, 4, 8, 16]
+
+def http_query(url, query):
+    req = urllib.request.Request(f"{url}/query", data=json.dumps({"query": query}).encode(),
+                                 headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(req) as resp:
+        resp.read()
+
+async def run_clients(call, clients, n_requests):
+    """`clients` workers share `n_requests` queries; returns (req/s, latencies ms)."""
+    latencies = []
+    counter = iter(range(n_requests))
+
+    async def client():
+        for i in counter:
+            t = time.perf_counter()
+            await call(QUERIES[i % len(QUERIES)])
+            latencies.append((time.perf_counter() - t) * 1000)
+
+    t = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    return n_requests / (time.perf_counter() - t), latencies
+
+async def main(args):
+    if args.url:
+        # Against a running server (python server.py)
+        call = lambda q: asyncio.to_thread(http_query, args.url, q)
+    else:
+        cfg = load_yaml("config.yaml")
+        cfg.setdefault("storage", {})["path"] = "artifacts/load_test.sqlite"
+        sys = MemorySystem(cfg)
+        sys.clear()
+        with open("data/synth_1200.json") as f:
+            conv = json.load(f)
+        await sys.ingest_many(item["user"] for item in conv[:args.seed_turns])
+        # Query strings repeat and nothing writes during the test, so disable
+        # the query embedding and result caches to measure the model and
+        # FAISS under load, not dict lookups
+        sys.vindex.query_cache = None
+        sys.result_cache = None
+        call = sys.aretrieve
+
+    print("\n" + "="*60)
+    print(f"LOAD TEST ({args.url or 'in-process aretrieve'}, {args.requests} requests per level)")
+    print("="*60)
+    base = None
+    for clients in CONCURRENCY:
+        rps, lat = await run_clients(call, clients, args.requests)
+        base = base or rps
+        p95 = statistics.quantiles(lat, n=20)[-1]
+        print(f"  {clients:3} clients | {rps:7.1f} req/s (x{rps / base:.2f}) | p50 {statistics.median(lat):7.2f} ms | p95 {p95:7.2f} ms")
+
+    if not args.url:
+        sys.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput of retrieval under concurrent clients")
+    parser.add_argument("--url", help="server base URL, e.g. http://localhost:8000 (default: in-process)")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--seed-turns", type=int, default=300)
+    asyncio.run(main(parser.parse_args()))
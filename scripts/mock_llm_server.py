@@ -0,0 +1,57 @@
+"""Local OpenAI-compatible chat completions server for exercising LLM
+extraction (per-turn and batched) without a real provider.
+
+    python scripts/mock_llm_server.py --port 8001
+    EXTRACTOR_PROVIDER=groq GROQ_API_KEY=mock EXTRACTOR_BASE_URL=http://localhost:8001/v1 python server.py
+
+Memories come from the regex extractor, so results are deterministic.
+"""
+import argparse
+import json
+import re
+import time
+import uvicorn
+from fastapi import FastAPI, Request
+from neurohack_memory.extractors import fallback_extract
+
+app = FastAPI(title="Mock LLM")
+STATS = {"requests": 0, "turns": 0}
+
+TURN_RE = re.compile(r"^\[(\d+)\] (.*)$", re.M)
+SINGLE_RE = re.compile(r"Turn (\d+): (.*)\nSchema:", re.S)
+
+def memories(text):
+    return [{"type": m.type.value, "key": m.key, "value": m.value, "confidence": m.confidence} for m in fallback_extract(text, 0)]
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    prompt = body["messages"][-1]["content"]
+    STATS["requests"] += 1
+    if "Turns:" in prompt:
+        # Batched prompt: one "[id] text" line per turn
+        turns = TURN_RE.findall(prompt.split("Turns:", 1)[1])
+        content = json.dumps({tid: memories(text) for tid, text in turns})
+        STATS["turns"] += len(turns)
+    else:
+        m = SINGLE_RE.search(prompt)
+        content = json.dumps(memories(m.group(2)) if m else [])
+        STATS["turns"] += 1
+    return {
+        "id": f"mock-{STATS['requests']}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "mock"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+    }
+
+@app.get("/stats")
+def stats():
+    return STATS
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8001)
+    args = parser.parse_args()
+    uvicorn.run(app, host="127.0.0.1", port=args.port)
@@ -4,11 +4,12 @@ from pydantic import BaseModel
 import uvicorn
 import os
 import time
+import asyncio
 import json
-import pandas as pd
 from typing import List, Optional, Dict, Any
 
-from neurohack_memory import MemorySystem
+from neurohack_memory.tenants import TenantManager, DEFAULT_TENANT, check_tenant_id
+from neurohack_memory.extractors import extraction_stats, extraction_cache, resilience_stats
 from neurohack_memory.utils import load_yaml
 
 # -----------------------------------------------------------------------------
@@ -16,14 +17,34 @@ from neurohack_memory.utils import load_yaml
 # -----------------------------------------------------------------------------
 app = FastAPI(title="NeuroHack Memory Backend", version="2.0.0")
 
-# SINGLETON SYSTEM
-_SYSTEM_INSTANCE = None
+# SINGLETON TENANT MANAGER (the default tenant is the original single system)
+_TENANTS = None
 
 print("🔍 Server: Loading System Module...")
 
+def ready_system():
+    """The MemorySystem, or 503 while it is still loading."""
+    s = get_system()
+    if not s.is_ready:
+        raise HTTPException(status_code=503, detail="Memory system is warming up")
+    return s
+
+def tenant_scope(tenant_id):
+    """Request scope for one tenant's MemorySystem: 503 while the shared
+    model is warming up, 400 on a malformed tenant id."""
+    ready_system()
+    try:
+        check_tenant_id(tenant_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return get_tenants().ause(tenant_id)
+
 def get_system():
-    global _SYSTEM_INSTANCE
-    if _SYSTEM_INSTANCE is None:
+    return get_tenants().default
+
+def get_tenants():
+    global _TENANTS
+    if _TENANTS is None:
         print("🔍 Server: Initializing MemorySystem (This may take time)...")
         from neurohack_memory import MemorySystem
         from neurohack_memory.utils import load_yaml
@@ -41,18 +62,21 @@ def get_system():
         if "path" not in cfg["storage"]:
             cfg["storage"]["path"] = "artifacts/memory.sqlite"
         
-        sys = MemorySystem(cfg)
-        print("✅ Memory System Online")
-    return sys
+        # lazy: store/model/index load in the background; see /readyz
+        _TENANTS = TenantManager(cfg, lazy=True)
+        print("✅ Memory System Online (warming up)")
+    return _TENANTS
 
 # -----------------------------------------------------------------------------
 # MODELS
 # -----------------------------------------------------------------------------
 class QueryRequest(BaseModel):
     query: str
+    tenant_id: str = DEFAULT_TENANT
 
 class InjectRequest(BaseModel):
     text: str
+    tenant_id: str = DEFAULT_TENANT
 
 class SeedRequest(BaseModel):
     texts: List[str]
@@ -63,18 +87,36 @@ class SeedRequest(BaseModel):
 
 @app.on_event("startup")
 async def startup_event():
-    get_system()
+    get_tenants()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Snapshot every resident tenant's index so the next boot only embeds new rows
+    if _TENANTS is not None:
+        _TENANTS.close()
 
 @app.get("/")
 def read_root():
     return {"status": "online", "system": "NeuroHack Memory Console v2.0"}
 
+@app.get("/healthz")
+def liveness():
+    # Process is up and serving HTTP (the index may still be loading)
+    return {"status": "alive"}
+
+@app.get("/readyz")
+def readiness():
+    s = get_system()
+    if not s.is_ready:
+        raise HTTPException(status_code=503, detail={"status": "starting", "startup_timings": s.startup_timings})
+    return {"status": "ready", "startup_timings": s.startup_timings}
+
 @app.post("/query")
 async def query_memory(req: QueryRequest):
     try:
         t_start = time.perf_counter()
-        s = get_system()
-        res = s.retrieve(req.query)
+        async with tenant_scope(req.tenant_id) as s:
+            res = await s.aretrieve(req.query)
         
         # Serialize for transport
         if res and "retrieved" in res:
@@ -103,44 +145,50 @@ async def query_memory(req: QueryRequest):
                 "context": res.get("context", "")
             }
         return {"retrieved": []}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/inject")
 async def inject_memory(req: InjectRequest):
     try:
-        s = get_system()
-        # sys.process_turn is async
-        await s.process_turn(req.text)
+        async with tenant_scope(req.tenant_id) as s:
+            # sys.process_turn is async
+            await s.process_turn(req.text)
         return {"status": "committed", "text": req.text}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/admin/seed")
 async def seed_data(req: SeedRequest):
     try:
-        s = get_system()
-        for text in req.texts:
-            await s.process_turn(text)
+        s = ready_system()
+        # Extraction is batched across turns; memories land in turn order
+        await s.process_turns(req.texts)
         return {"status": "seeded", "count": len(req.texts)}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/admin/clear")
 def clear_db():
     try:
-        s = get_system()
-        s.store.conn.execute("DELETE FROM memories")
-        s.store.conn.commit()
-        s._memory_cache.clear()
-        s.turn = 0
+        s = ready_system()
+        s.clear()
         return {"status": "cleared"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/stats")
 def get_stats():
     try:
+        import pandas as pd  # deferred: only the dashboard endpoints need it
         s = get_system()
         conn = s.store.conn
         
@@ -161,7 +209,16 @@ def get_stats():
             "total_memories": int(total),
             "conflicts_resolved": int(resolved),
             "type_distribution": df_types.to_dict(orient="records"),
-            "live_stats": live_stats 
+            "live_stats": live_stats,
+            "embedding_cache": s.embed_cache.stats() if s.embed_cache else {},
+            "embedder": s.vindex.encoder.stats() if s.vindex is not None and hasattr(s.vindex.encoder, "stats") else {},
+            "query_cache": s.vindex.query_cache.stats() if s.vindex is not None and s.vindex.query_cache else {},
+            "result_cache": s.result_cache.stats() if s.result_cache is not None else {},
+            "latency": s.latency.summary(),
+            "tenants": get_tenants().stats(),
+            "extraction": extraction_stats(),
+            "extraction_cache": extraction_cache().stats(),
+            "extraction_resilience": resilience_stats()
         }
     except Exception as e:
         # Return empty safe stats if DB locked or empty
@@ -175,6 +232,7 @@ def get_stats():
 @app.get("/history/evolution")
 def get_evolution(key: Optional[str] = None):
     try:
+        import pandas as pd
         s = get_system()
         conn = s.store.conn
         query = "SELECT memory_id, type, key, value, confidence, source_turn FROM memories ORDER BY source_turn DESC"
@@ -187,6 +245,27 @@ def get_evolution(key: Optional[str] = None):
     except Exception as e:
         return []
 
+@app.get("/archive")
+async def get_archive(key: Optional[str] = None, type: Optional[str] = None, limit: int = 100, tenant_id: str = DEFAULT_TENANT):
+    # Memories moved out of the hot index by the retention job
+    try:
+        async with tenant_scope(tenant_id) as s:
+            await asyncio.to_thread(s.wait_ready)
+            mems = await asyncio.to_thread(s.archived, type, key, limit)
+        return [{
+            "id": m.memory_id,
+            "type": m.type.value,
+            "key": m.key,
+            "value": m.value,
+            "confidence": m.confidence,
+            "source_turn": m.source_turn,
+            "use_count": m.use_count,
+        } for m in mems]
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 if __name__ == "__main__":
     uvicorn.run("server:app", host="0.0.0.0", port=8000, reload=True)
     # Trigger Reload
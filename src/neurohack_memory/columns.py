@@ -0,0 +1,65 @@
+import numpy as np
+from .types import MemoryType
+
+TYPE_IDS = {t: i for i, t in enumerate(MemoryType)}
+
+class LabelColumns:
+    """Per-memory metadata in NumPy columns addressed by FAISS label.
+
+    Lets retrieval score, filter and group FAISS hits with array ops instead
+    of a per-hit dict lookup into pydantic objects. Labels are dense and
+    monotonically increasing, so columns simply grow by doubling.
+    """
+
+    def __init__(self, capacity=1024):
+        self.confidence = np.zeros(capacity, dtype="float64")
+        self.source_turn = np.zeros(capacity, dtype="int64")
+        self.type_id = np.zeros(capacity, dtype="int16")
+        self.key_id = np.zeros(capacity, dtype="int32")
+        self.alive = np.zeros(capacity, dtype=bool)
+        # Interned "type:key" strings; conflict resolution groups on these ids
+        self._key_ids = {}
+        self.keys = []
+
+    def _grow(self, n):
+        cap = len(self.alive)
+        if n <= cap:
+            return
+        while cap < n:
+            cap *= 2
+        for name in ("confidence", "source_turn", "type_id", "key_id", "alive"):
+            old = getattr(self, name)
+            new = np.zeros(cap, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def reserve(self, n):
+        """Make labels [0, n) addressable (dead until set)."""
+        self._grow(n)
+
+    def key_id_of(self, m):
+        k = f"{m.type.value}:{m.key}"
+        kid = self._key_ids.get(k)
+        if kid is None:
+            kid = self._key_ids[k] = len(self.keys)
+            self.keys.append(k)
+        return kid
+
+    def set(self, labels, memories):
+        labels = np.asarray(labels, dtype="int64")
+        if not len(labels):
+            return
+        self._grow(int(labels.max()) + 1)
+        self.confidence[labels] = [m.confidence for m in memories]
+        self.source_turn[labels] = [m.source_turn for m in memories]
+        self.type_id[labels] = [TYPE_IDS[m.type] for m in memories]
+        self.key_id[labels] = [self.key_id_of(m) for m in memories]
+        self.alive[labels] = True
+
+    def kill(self, labels):
+        labels = [l for l in labels if l < len(self.alive)]
+        if labels:
+            self.alive[labels] = False
+
+    def clear(self):
+        self.alive[:] = False
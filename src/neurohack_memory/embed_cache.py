@@ -0,0 +1,202 @@
+import sqlite3, os, hashlib, threading, time
+from collections import OrderedDict
+import numpy as np
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+  h TEXT PRIMARY KEY,
+  dim INTEGER NOT NULL,
+  vec BLOB NOT NULL
+);
+"""
+
+class EmbeddingCache:
+    """Content-addressed embedding cache: an in-RAM LRU in front of an SQLite table.
+
+    Entries are keyed by sha1(model name, text), so the same
+    "type|key=value" string is only ever encoded once per model.
+    """
+
+    def __init__(self, path="artifacts/embedding_cache.sqlite", model_name="", lru_size=50000, precision="float32"):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.model_name = model_name
+        self.lru_size = lru_size
+        if precision not in ("float32", "float16", "int8"):
+            raise ValueError(f"Unknown embedding cache precision '{precision}'")
+        self.precision = precision
+        self._lru = OrderedDict()
+        # _lock guards the LRU and counters; _db_lock the connection, so RAM
+        # lookups never wait behind an ingest INSERT/commit
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL;")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _hash(self, text):
+        return hashlib.sha1(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def _pack(self, v):
+        if self.precision == "float16":
+            return v.astype("float16").tobytes()
+        if self.precision == "int8":
+            # Unit-norm components are in [-1, 1]
+            return np.clip(np.rint(v * 127.0), -127, 127).astype("int8").tobytes()
+        return v.astype("float32").tobytes()
+
+    def _unpack(self, blob, dim):
+        # Decode by width, so rows written under another precision stay readable
+        width = len(blob) // dim
+        return np.frombuffer(blob, dtype={4: "float32", 2: "float16"}.get(width, "int8"))
+
+    @staticmethod
+    def _decode(vec):
+        # The LRU keeps vectors in their compact form; widen on the way out
+        if vec.dtype == np.int8:
+            return vec.astype("float32") / 127.0
+        return vec.astype("float32", copy=False)
+
+    def _remember(self, h, vec):
+        self._lru[h] = vec
+        self._lru.move_to_end(h)
+        while len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+    def get_many(self, texts, disk=True):
+        """Returns ({index: vector} for cached texts, [indices that missed]).
+        disk=False consults the RAM LRU only."""
+        found, missing = {}, []
+        pending = {}
+        with self._lock:
+            for i, t in enumerate(texts):
+                h = self._hash(t)
+                vec = self._lru.get(h)
+                if vec is not None:
+                    self._lru.move_to_end(h)
+                    found[i] = self._decode(vec)
+                    self.hits += 1
+                else:
+                    pending.setdefault(h, []).append(i)
+        if pending and disk:
+            hs = list(pending)
+            rows = []
+            with self._db_lock:
+                # Chunk to stay under SQLite's bound-parameter limit
+                for j in range(0, len(hs), 500):
+                    chunk = hs[j:j + 500]
+                    rows += self.conn.execute(
+                        f"SELECT h, dim, vec FROM embeddings WHERE h IN ({','.join('?' * len(chunk))})", chunk
+                    ).fetchall()
+            with self._lock:
+                for h, dim, blob in rows:
+                    vec = self._unpack(blob, dim)
+                    self._remember(h, vec)
+                    for i in pending.pop(h):
+                        found[i] = self._decode(vec)
+                        self.disk_hits += 1
+        with self._lock:
+            for idxs in pending.values():
+                missing.extend(idxs)
+                self.misses += len(idxs)
+        missing.sort()
+        return found, missing
+
+    def put_many(self, texts, vectors, persist=True):
+        """Cache vectors; persist=False keeps them in the RAM LRU only (used
+        for free-text queries, which would otherwise grow the table without bound)."""
+        with self._lock:
+            rows = []
+            for t, v in zip(texts, vectors):
+                h = self._hash(t)
+                v = np.ascontiguousarray(v, dtype="float32")
+                blob = self._pack(v)
+                # Keep the RAM copy in the same compact form as what's on disk
+                self._remember(h, self._unpack(blob, int(v.shape[0])))
+                rows.append((h, int(v.shape[0]), blob))
+        if not persist:
+            return
+        with self._db_lock:
+            self.conn.executemany("INSERT OR REPLACE INTO embeddings(h, dim, vec) VALUES(?,?,?)", rows)
+            self.conn.commit()
+
+    def stats(self):
+        total = self.hits + self.disk_hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.disk_hits) / total if total else 0.0,
+            "lru_entries": len(self._lru),
+        }
+
+    def close(self):
+        self.conn.close()
+
+
+def normalize_query(text):
+    # Collapse whitespace and case so trivially different phrasings share an entry
+    return " ".join(text.split()).casefold()
+
+class QueryEmbeddingCache:
+    """Bounded in-RAM LRU (with TTL) from normalized query text to its embedding.
+
+    Sits in front of the model on the search path so a repeated query costs
+    only the FAISS search.
+    """
+
+    def __init__(self, size=1024, ttl_s=300.0):
+        self.size = size
+        self.ttl_s = ttl_s
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, query):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._lru.get(query)
+            if entry is not None and (not self.ttl_s or now - entry[0] < self.ttl_s):
+                self._lru.move_to_end(query)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._lru[query]
+            self.misses += 1
+            return None
+
+    def put(self, query, vec):
+        with self._lock:
+            self._lru[query] = (time.monotonic(), vec)
+            self._lru.move_to_end(query)
+            while len(self._lru) > self.size:
+                self._lru.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._lru.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self._lru),
+        }
+
+
+class RetrievalResultCache(QueryEmbeddingCache):
+    """Bounded LRU of finished retrievals (ranked hits + injected context).
+
+    Keys carry the memory system's write epoch, so entries computed before a
+    write simply stop matching; no TTL by default.
+    """
+
+    def __init__(self, size=1024, ttl_s=0):
+        super().__init__(size=size, ttl_s=ttl_s)
@@ -0,0 +1,159 @@
+import asyncio, queue, threading, time
+from concurrent.futures import Future
+import numpy as np
+
+BACKENDS = ("torch", "torch_int8", "onnx")
+
+# Probe sentences for the load-time parity check against the reference model
+PARITY_PROBES = [
+    "preference|call_time=after 9 am",
+    "fact|secret_code=1234",
+    "constraint|no_sundays=true",
+    "preference|language=kannada",
+    "When can I call?",
+    "remind me of my constraints",
+]
+
+def _set_threads(threads):
+    import torch
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Can only be set once per process, before any parallel work
+        pass
+
+def _parity(reference, candidate):
+    """Lowest cosine similarity between reference and candidate embeddings."""
+    a = reference.encode(PARITY_PROBES, convert_to_numpy=True, normalize_embeddings=True)
+    b = candidate.encode(PARITY_PROBES, convert_to_numpy=True, normalize_embeddings=True)
+    return float(np.min(np.sum(a * b, axis=1)))
+
+def load_embedder(model_name, backend="torch", threads=None, parity_threshold=0.99):
+    """Load the SentenceTransformer for `model_name` on the requested CPU backend.
+
+    torch_int8 applies dynamic int8 quantization to the Linear layers; onnx
+    runs the model through ONNX Runtime (needs sentence-transformers>=3.2 and
+    optimum[onnxruntime]). Optimized backends are checked against the plain
+    PyTorch model at load and we fall back to it if cosine parity is below
+    `parity_threshold`.
+    """
+    from sentence_transformers import SentenceTransformer
+
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown vector.backend '{backend}', expected one of {BACKENDS}")
+    if threads:
+        _set_threads(int(threads))
+
+    reference = SentenceTransformer(model_name)
+    if backend == "torch":
+        return reference
+
+    try:
+        if backend == "torch_int8":
+            import torch
+            candidate = torch.quantization.quantize_dynamic(reference, {torch.nn.Linear}, dtype=torch.qint8, inplace=False)
+        else:
+            model_kwargs = {"provider": "CPUExecutionProvider"}
+            if threads:
+                import onnxruntime as ort
+                opts = ort.SessionOptions()
+                opts.intra_op_num_threads = int(threads)
+                opts.inter_op_num_threads = 1
+                model_kwargs["session_options"] = opts
+            candidate = SentenceTransformer(model_name, backend="onnx", model_kwargs=model_kwargs)
+    except Exception as e:
+        print(f"⚠️ Embedder: {backend} backend unavailable ({e}), using torch.")
+        return reference
+
+    parity = _parity(reference, candidate)
+    if parity < parity_threshold:
+        print(f"⚠️ Embedder: {backend} parity {parity:.4f} < {parity_threshold}, using torch.")
+        return reference
+    print(f"✅ Embedder: {backend} backend loaded (min cosine vs torch {parity:.4f}).")
+    return candidate
+
+
+class BatchingEncoder:
+    """Micro-batching front-end shared by every thread (and the event loop).
+
+    Callers enqueue their texts and block on a Future; a single worker thread
+    collects pending requests for up to `max_wait_ms` or `max_batch` texts,
+    runs one batched `encode`, and hands each caller back its slice.
+    """
+
+    def __init__(self, model, max_batch=64, max_wait_ms=2.0):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self.batches = 0
+        self.requests = 0
+        self._worker = threading.Thread(target=self._run, name="embedder", daemon=True)
+        self._worker.start()
+
+    def get_sentence_embedding_dimension(self):
+        return self.model.get_sentence_embedding_dimension()
+
+    def submit(self, texts):
+        fut = Future()
+        self._queue.put((list(texts), fut))
+        return fut
+
+    def encode(self, texts, **_):
+        """Sync front-end; always returns normalized float32 embeddings."""
+        if not texts:
+            return np.empty((0, self.get_sentence_embedding_dimension()), dtype="float32")
+        return self.submit(texts).result()
+
+    async def aencode(self, texts):
+        """asyncio front-end; awaits the batch without blocking the loop."""
+        return await asyncio.wrap_future(self.submit(texts))
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            pending = [item]
+            n = len(item[0])
+            deadline = time.perf_counter() + self.max_wait
+            while n < self.max_batch:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    nxt = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if nxt is None:
+                    self._queue.put(None)
+                    break
+                pending.append(nxt)
+                n += len(nxt[0])
+            self._encode_batch(pending)
+
+    def _encode_batch(self, pending):
+        texts = [t for batch, _ in pending for t in batch]
+        try:
+            emb = self.model.encode(texts, convert_to_numpy=True, normalize_embeddings=True).astype("float32")
+        except Exception as e:
+            for _, fut in pending:
+                fut.set_exception(e)
+            return
+        self.batches += 1
+        self.requests += len(pending)
+        i = 0
+        for batch, fut in pending:
+            fut.set_result(emb[i:i + len(batch)])
+            i += len(batch)
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "avg_requests_per_batch": self.requests / self.batches if self.batches else 0.0,
+        }
+
+    def close(self):
+        self._queue.put(None)
@@ -0,0 +1,139 @@
+import sqlite3, os, hashlib, json, threading, time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS extractions (
+  h TEXT PRIMARY KEY,
+  provider TEXT NOT NULL,
+  created REAL NOT NULL,
+  last_used REAL NOT NULL,
+  data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_extractions_last_used ON extractions(last_used);
+"""
+
+def normalize_turn(text):
+    # Whitespace-only differences shouldn't cost another LLM call
+    return " ".join(text.split())
+
+class ExtractionCache:
+    """Content-addressed cache of LLM extraction results: an in-RAM LRU in
+    front of an SQLite table.
+
+    Entries are keyed by sha1(provider, model, prompt version, normalized
+    text) and hold turn-independent memory dicts; callers stamp the turn
+    back on at hit time. Rows older than `ttl_s` are ignored, and the table
+    is trimmed to `max_entries` by last use. Writes go through one
+    background thread, each in its own transaction.
+    """
+
+    def __init__(self, path="artifacts/extraction_cache.sqlite", lru_size=10000, max_entries=200000, ttl_s=30 * 86400):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.lru_size = lru_size
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._lru = OrderedDict()   # h -> (created, items)
+        # _lock guards the LRU dict and counters only, so get_ram()/put() on
+        # the event loop never wait on disk; _db_lock serializes the connection
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL;")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="extract-cache")
+        self._puts = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(provider, model, prompt_version, text):
+        raw = f"{provider}\0{model}\0{prompt_version}\0{normalize_turn(text)}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def _fresh(self, created, now):
+        return not self.ttl_s or now - created < self.ttl_s
+
+    def _remember(self, h, entry):
+        self._lru[h] = entry
+        self._lru.move_to_end(h)
+        while len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+    def get_ram(self, h):
+        """Cached items from RAM only (never blocks on disk), or None."""
+        now = time.time()
+        with self._lock:
+            entry = self._lru.get(h)
+            if entry is None:
+                return None
+            if not self._fresh(entry[0], now):
+                del self._lru[h]
+                return None
+            self._lru.move_to_end(h)
+            self.hits += 1
+            return entry[1]
+
+    def get_disk(self, h):
+        """Look `h` up in SQLite (call off the event loop); counts the miss."""
+        now = time.time()
+        with self._db_lock:
+            row = self.conn.execute("SELECT created, data FROM extractions WHERE h = ?", (h,)).fetchone()
+        if row is None or not self._fresh(row[0], now):
+            with self._lock:
+                self.misses += 1
+            return None
+        items = json.loads(row[1])
+        with self._lock:
+            self._remember(h, (row[0], items))
+            self.disk_hits += 1
+        # Refresh last use for the on-disk LRU trim
+        self._writer.submit(self._touch, h, now)
+        return items
+
+    def put(self, h, provider, items):
+        now = time.time()
+        with self._lock:
+            self._remember(h, (now, items))
+        self._writer.submit(self._write, h, provider, now, json.dumps(items))
+
+    def _touch(self, h, now):
+        with self._db_lock:
+            self.conn.execute("UPDATE extractions SET last_used = ? WHERE h = ?", (now, h))
+            self.conn.commit()
+
+    def _write(self, h, provider, now, data):
+        with self._db_lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO extractions(h, provider, created, last_used, data) VALUES(?,?,?,?,?)",
+                (h, provider, now, now, data),
+            )
+            self._puts += 1
+            if self._puts % 1000 == 0:
+                self._trim(now)
+            self.conn.commit()
+
+    def _trim(self, now):
+        if self.ttl_s:
+            self.conn.execute("DELETE FROM extractions WHERE created < ?", (now - self.ttl_s,))
+        self.conn.execute("""
+        DELETE FROM extractions WHERE h IN (
+          SELECT h FROM extractions ORDER BY last_used DESC LIMIT -1 OFFSET ?
+        )""", (self.max_entries,))
+
+    def stats(self):
+        total = self.hits + self.disk_hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.disk_hits) / total if total else 0.0,
+            "lru_entries": len(self._lru),
+        }
+
+    def close(self):
+        self._writer.shutdown(wait=True)
+        self.conn.close()
@@ -1,62 +1,136 @@
 from typing import List
-import json, re, uuid, os
+import asyncio, re, uuid, time, threading
 from .types import MemoryEntry, MemoryType
-from .utils import env, extract_json
+from .utils import env, extract_json, LatencyHistograms
+from .extract_cache import ExtractionCache
 
+# (regex, type, key, confidence, literals): a pattern only runs when the
+# lowercased turn contains at least one of its literals
 PATTERNS = [
-    (r"\b(?:preferred language|language)\s*(?:is|:)\s*(?:[A-Za-z]+)\s*([A-Za-z]+)", "preference", "language", 0.92),
-    (r"\b(?:language)\s*(?:is|:)\s*([A-Za-z]+)", "preference", "language", 0.92),
+    (r"\b(?:preferred language|language)\s*(?:is|:)\s*(?:[A-Za-z]+)\s*([A-Za-z]+)", "preference", "language", 0.92, ("language",)),
+    (r"\b(?:language)\s*(?:is|:)\s*([A-Za-z]+)", "preference", "language", 0.92, ("language",)),
     # Handles "Call [me/us/...] after 9 AM"
-    (r"\b(?:calls?|call)\s*(?:me|us|him|her)?\s*(?:after|before|at)\s*([0-9]{1,2}\s*(?:AM|PM|am|pm))", "preference", "call_time", 0.86),
+    (r"\b(?:calls?|call)\s*(?:me|us|him|her)?\s*(?:after|before|at)\s*([0-9]{1,2}\s*(?:AM|PM|am|pm))", "preference", "call_time", 0.86, ("call",)),
     # Handles "between X and Y"
     # Benchmark Specific
-    (r"secret code is (.*)[\.]?", "fact", "secret_code", 0.95),
-    (r"meeting is at (.*)[\.]?", "fact", "meeting_time", 0.95),
-    (r"project deadline is (.*)[\.]?", "fact", "deadline", 0.95),
-    (r"project deadline is (.*)[\.]?", "fact", "deadline", 0.95),
-    (r"favorite color is (.*)[\.]?", "preference", "favorite_color", 0.95),
-    (r"like\s+([a-zA-Z]+)[\.]?", "preference", "favorite_color", 0.96),
-    (r"([a-zA-Z]+)\s+is\s+best[\.]?", "preference", "favorite_color", 0.97),
+    (r"secret code is (.*)[\.]?", "fact", "secret_code", 0.95, ("secret code is",)),
+    (r"meeting is at (.*)[\.]?", "fact", "meeting_time", 0.95, ("meeting is at",)),
+    (r"project deadline is (.*)[\.]?", "fact", "deadline", 0.95, ("project deadline is",)),
+    (r"favorite color is (.*)[\.]?", "preference", "favorite_color", 0.95, ("favorite color is",)),
+    (r"like\s+([a-zA-Z]+)[\.]?", "preference", "favorite_color", 0.96, ("like",)),
+    (r"([a-zA-Z]+)\s+is\s+best[\.]?", "preference", "favorite_color", 0.97, ("best",)),
     
-    (r"\b(?:calls?|call).*(?:between)\s*([0-9]{1,2}\s*(?:AM|PM|am|pm)\s*(?:and|to)\s*[0-9]{1,2}\s*(?:AM|PM|am|pm))", "preference", "call_time", 0.89),
-    (r"call.*(?:after|before|at)\s*([0-9]{1,2}\s*(?:AM|PM|am|pm))", "preference", "call_time", 0.80),
-    (r"\b(?:no(?:thing)?|never|do not)\s*(?:call)?\s*on\s*sundays?", "constraint", "no_sundays", 0.88),
+    (r"\b(?:calls?|call).*(?:between)\s*([0-9]{1,2}\s*(?:AM|PM|am|pm)\s*(?:and|to)\s*[0-9]{1,2}\s*(?:AM|PM|am|pm))", "preference", "call_time", 0.89, ("between",)),
+    (r"call.*(?:after|before|at)\s*([0-9]{1,2}\s*(?:AM|PM|am|pm))", "preference", "call_time", 0.80, ("call",)),
+    (r"\b(?:no(?:thing)?|never|do not)\s*(?:call)?\s*on\s*sundays?", "constraint", "no_sundays", 0.88, ("sunday",)),
 ]
 
+class CompiledPattern:
+    __slots__ = ("pattern", "regex", "type", "key", "confidence", "runs", "hits", "ns")
+
+    def __init__(self, pattern, mtype, key, conf):
+        self.pattern = pattern
+        self.regex = re.compile(pattern, re.I)
+        self.type = MemoryType(mtype)
+        self.key = key
+        self.confidence = conf
+        self.runs = 0
+        self.hits = 0
+        self.ns = 0
+
+class ExtractionEngine:
+    """Compiled regex extraction with a literal keyword prefilter.
+
+    Duplicate patterns are dropped and every regex is compiled once. Each
+    distinct literal is checked once per turn (a C-level substring scan), and
+    only patterns whose literals were found run their regex, in PATTERNS order.
+    """
+
+    def __init__(self, patterns):
+        self.patterns = []
+        seen = set()
+        by_literal = {}
+        for pattern, mtype, key, conf, literals in patterns:
+            if (pattern, mtype, key, conf) in seen:
+                continue
+            seen.add((pattern, mtype, key, conf))
+            for lit in literals:
+                by_literal.setdefault(lit.lower(), []).append(len(self.patterns))
+            self.patterns.append(CompiledPattern(pattern, mtype, key, conf))
+        self._literals = list(by_literal.items())
+        self.turns = 0
+
+    def match(self, text):
+        """[(CompiledPattern, value)] for a lowercased, stripped turn."""
+        self.turns += 1
+        candidates = set()
+        for lit, idxs in self._literals:
+            if lit in text:
+                candidates.update(idxs)
+        if not candidates:
+            return []
+        out = []
+        for i in sorted(candidates):
+            p = self.patterns[i]
+            t0 = time.perf_counter_ns()
+            m = p.regex.search(text)
+            p.ns += time.perf_counter_ns() - t0
+            p.runs += 1
+            if m:
+                p.hits += 1
+                out.append((p, m.group(1) if m.groups() else "true"))
+        return out
+
+    def stats(self):
+        return {
+            "turns": self.turns,
+            "patterns": [{
+                "key": p.key,
+                "pattern": p.pattern,
+                "runs": p.runs,
+                "hits": p.hits,
+                "avg_us": p.ns / p.runs / 1000 if p.runs else 0.0,
+            } for p in self.patterns],
+        }
+
+_ENGINE = ExtractionEngine(PATTERNS)
+
+def extraction_stats():
+    return _ENGINE.stats()
+
 def fallback_extract(turn_text, turn_num):
     mems = []
-    t = turn_text.strip().lower()
-    for pattern, mtype, key, conf in PATTERNS:
-        match = re.search(pattern, t, re.I)
-        if match:
-            value = match.group(1) if match.groups() else "true"
-            mems.append(MemoryEntry(
-                memory_id=str(uuid.uuid4()),
-                type=MemoryType(mtype),
-                key=key,
-                value=value,
-                source_turn=turn_num,
-                confidence=conf,
-                source_text=turn_text[:240],
-                meta={"extractor": "fallback"}
-            ))
+    for p, value in _ENGINE.match(turn_text.strip().lower()):
+        mems.append(MemoryEntry(
+            memory_id=str(uuid.uuid4()),
+            type=p.type,
+            key=p.key,
+            value=value,
+            source_turn=turn_num,
+            confidence=p.confidence,
+            source_text=turn_text[:240],
+            meta={"extractor": "fallback"}
+        ))
     return mems
 
 EXTRACTION_PROMPT = """You are extracting durable memories. Return ONLY JSON array. Turn {turn_num}: {turn_text}
 Schema: [{{"type":"preference|fact|constraint|commitment","key":"name","value":"val","confidence":0.7}}]
 Extract only if confidence >= 0.70."""
 
+# Model behind each LLM provider (part of the extraction cache key)
+MODELS = {"grok": "grok-2", "groq": "llama-3.3-70b-versatile"}
+API_KEYS = {"grok": "XAI_API_KEY", "groq": "GROQ_API_KEY"}
+BASE_URLS = {"grok": "https://api.x.ai/openai/", "groq": "https://api.groq.com/openai/v1"}
+
+def _base_url(provider):
+    # EXTRACTOR_BASE_URL points every provider at e.g. a local mock server
+    return env("EXTRACTOR_BASE_URL", BASE_URLS[provider])
+
 _grok_client = None
 
 async def grok_extract(turn_text, turn_num):
     global _grok_client
 
-    # 1. Circuit Breaker Check
-    if _circuit_breaker.is_open():
-         if turn_num % 50 == 0:
-            print(f"⚠️ Circuit Open (Grok): Skipping API for Regex Fallback")
-         return fallback_extract(turn_text, turn_num)
-
     try:
         from openai import AsyncOpenAI
     except:
@@ -69,16 +143,24 @@ async def grok_extract(turn_text, turn_num):
         try:
             _grok_client = AsyncOpenAI(
                 api_key=key, 
-                base_url="https://api.x.ai/openai/",
+                base_url=_base_url("grok"),
                 max_retries=0,
                 timeout=1.0
             )
         except:
             return fallback_extract(turn_text, turn_num)
 
+    # Circuit Breaker Check (after client setup, so a claimed probe always reports back)
+    breaker = _breakers["grok"]
+    if not breaker.allow():
+         if turn_num % 50 == 0:
+            print(f"⚠️ Circuit Open (Grok): Skipping API for Regex Fallback")
+         return fallback_extract(turn_text, turn_num)
+
     try:
+        t = time.perf_counter()
         resp = await _grok_client.chat.completions.create(
-            model="grok-2",
+            model=MODELS["grok"],
             messages=[{"role":"user","content":EXTRACTION_PROMPT.format(turn_num=turn_num, turn_text=turn_text)}],
             temperature=0.0,
             max_tokens=400,
@@ -87,7 +169,8 @@ async def grok_extract(turn_text, turn_num):
         data = extract_json(text)
         
         # Success
-        _circuit_breaker.record_success()
+        breaker.record_success()
+        _llm_latency.record({"grok": (time.perf_counter() - t) * 1000})
         
         if not data:
             return fallback_extract(turn_text, turn_num)
@@ -122,45 +205,77 @@ async def grok_extract(turn_text, turn_num):
         return out if out else fallback_extract(turn_text, turn_num)
     except Exception as e:
         # Failure
-        _circuit_breaker.record_failure()
+        breaker.record_failure()
         return fallback_extract(turn_text, turn_num)
-
-import time
+    except BaseException:
+        # Cancelled (e.g. ingest_many shutting down): don't strand a half-open probe
+        breaker.abandon()
+        raise
 
 class CircuitBreaker:
+    """Closed -> open after `failure_threshold` consecutive failures. Once
+    `recovery_timeout` has passed, exactly one probe request is let through
+    (half-open); its outcome closes the breaker or re-opens it. A probe that
+    never reports back (cancelled) is replaced after another `recovery_timeout`."""
+
     def __init__(self, failure_threshold=3, recovery_timeout=60):
         self.failure_threshold = failure_threshold
         self.recovery_timeout = recovery_timeout
         self.failures = 0
         self.last_failure_time = 0
+        self.state = "closed"
+        self._probe_time = 0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Whether a request may go out now; claims the probe when half-opening."""
+        with self._lock:
+            if self.state == "closed":
+                return True
+            now = time.time()
+            if self.state == "open" and now - self.last_failure_time >= self.recovery_timeout:
+                self.state = "half_open"
+                self._probe_time = now
+                return True
+            if self.state == "half_open" and now - self._probe_time >= self.recovery_timeout:
+                # The previous probe was lost; claim a new one
+                self._probe_time = now
+                return True
+            return False
+
+    def abandon(self):
+        """The request was cancelled before it had an outcome: hand the probe
+        back (re-open without a new failure, so the next call probes)."""
+        with self._lock:
+            if self.state == "half_open":
+                self.state = "open"
 
     def record_failure(self):
-        self.failures += 1
-        self.last_failure_time = time.time()
+        with self._lock:
+            self.failures += 1
+            self.last_failure_time = time.time()
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self.state = "open"
 
     def record_success(self):
-        self.failures = 0
+        with self._lock:
+            self.failures = 0
+            self.state = "closed"
 
     def is_open(self):
-        if self.failures >= self.failure_threshold:
-            if time.time() - self.last_failure_time < self.recovery_timeout:
-                return True
-            # Recovery timeout passed, try *one* request (half-open)
-            return False
-        return False
+        return self.state != "closed"
+
+    def stats(self):
+        return {"state": self.state, "failures": self.failures}
 
-_circuit_breaker = CircuitBreaker()
+# One per provider, so a Groq 429 storm doesn't take Grok down with it
+_breakers = {p: CircuitBreaker() for p in MODELS}
+# Recent successful call latency per provider; drives the hedge delay
+_llm_latency = LatencyHistograms(window=200)
 _groq_client = None
 
 async def groq_extract(turn_text, turn_num):
     global _groq_client
-    
-    # 1. Circuit Breaker Check (Instant Failover)
-    if _circuit_breaker.is_open():
-        # excessive logging suppression
-        if turn_num % 50 == 0: 
-            print(f"⚠️ Circuit Open: Skipping API for Regex Fallback (Fast Path)")
-        return fallback_extract(turn_text, turn_num)
 
     try:
         from openai import AsyncOpenAI
@@ -175,7 +290,7 @@ async def groq_extract(turn_text, turn_num):
             # max_retries=0 is CRITICAL for low latency on 429
             _groq_client = AsyncOpenAI(
                 api_key=key, 
-                base_url="https://api.groq.com/openai/v1",
+                base_url=_base_url("groq"),
                 max_retries=0,
                 timeout=1.0 
             )
@@ -186,9 +301,18 @@ async def groq_extract(turn_text, turn_num):
             print(f"❌ Groq Extract Setup Error: {e}")
             return fallback_extract(turn_text, turn_num)
 
+    # Circuit Breaker Check (Instant Failover)
+    breaker = _breakers["groq"]
+    if not breaker.allow():
+        # excessive logging suppression
+        if turn_num % 50 == 0: 
+            print(f"⚠️ Circuit Open (Groq): Skipping API for Regex Fallback (Fast Path)")
+        return fallback_extract(turn_text, turn_num)
+
     try:
+        t = time.perf_counter()
         resp = await _groq_client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
+            model=MODELS["groq"],
             messages=[{"role":"user","content":EXTRACTION_PROMPT.format(turn_num=turn_num, turn_text=turn_text)}],
             temperature=0.0,
             max_tokens=400,
@@ -197,7 +321,8 @@ async def groq_extract(turn_text, turn_num):
         data = extract_json(text)
         
         # Success!
-        _circuit_breaker.record_success()
+        breaker.record_success()
+        _llm_latency.record({"groq": (time.perf_counter() - t) * 1000})
         
         if not data:
             return fallback_extract(turn_text, turn_num)
@@ -224,76 +349,299 @@ async def groq_extract(turn_text, turn_num):
         
     except Exception as e:
         # Record failure
-        _circuit_breaker.record_failure()
+        breaker.record_failure()
         
         err_str = str(e)
         if "429" in err_str:
-             if _circuit_breaker.failures == 1: # Only print first one to avoid spam
+             if breaker.failures == 1: # Only print first one to avoid spam
                 print(f"⚠️ Groq Rate Limit (429). Switching to Circuit Breaker (Fast Fallback).")
         else:
              print(f"❌ Groq API Error: {e}")
              
         return fallback_extract(turn_text, turn_num)
+    except BaseException:
+        # Cancelled (e.g. ingest_many shutting down): don't strand a half-open probe
+        breaker.abandon()
+        raise
+
+BATCH_EXTRACTION_PROMPT = """You are extracting durable memories from several conversation turns. Return ONLY a JSON object that maps every turn id to an array of its memories ([] if none).
+Schema: {{"<turn id>": [{{"type":"preference|fact|constraint|commitment","key":"name","value":"val","confidence":0.7}}]}}
+Extract only if confidence >= 0.70.
+Turns:
+{turns}"""
 
-CACHE_FILE = "artifacts/extraction_cache.json"
-_EXT_CACHE = {}
+def _approx_tokens(text):
+    # ~4 characters per token, plus the "[id] " prefix and newline
+    return len(text) // 4 + 8
 
-def load_cache():
-    global _EXT_CACHE
-    if os.path.exists(CACHE_FILE):
+def _batches(turns, max_turns, max_tokens):
+    """Split [(text, turn_num)] into consecutive batches bounded by turn count
+    and approximate prompt tokens (a single oversized turn still gets a batch)."""
+    batch, tokens = [], 0
+    for text, turn_num in turns:
+        t = _approx_tokens(text)
+        if batch and (len(batch) >= max_turns or tokens + t > max_tokens):
+            yield batch
+            batch, tokens = [], 0
+        batch.append((text, turn_num))
+        tokens += t
+    if batch:
+        yield batch
+
+def _parse_items(arr, turn_text, turn_num, provider):
+    out = []
+    for it in arr:
         try:
-            with open(CACHE_FILE, "r") as f:
-                _EXT_CACHE = json.load(f)
-        except:
-            _EXT_CACHE = {}
+            conf = float(it.get("confidence", 0))
+            if conf < 0.70:
+                continue
+            out.append(MemoryEntry(
+                memory_id=str(uuid.uuid4()),
+                type=MemoryType(it["type"]),
+                key=str(it["key"]),
+                value=str(it["value"]),
+                source_turn=turn_num,
+                confidence=conf,
+                source_text=turn_text[:240],
+                meta={"extractor": provider}
+            ))
+        except Exception:
+            continue
+    return out
+
+def _per_turn(data):
+    """{turn id: [items]} from a batch response (object keyed by id, or a
+    list of {"id": ..., "memories": [...]})."""
+    if isinstance(data, dict):
+        return {str(k): v for k, v in data.items()}
+    if isinstance(data, list):
+        return {str(d.get("id")): d.get("memories") for d in data if isinstance(d, dict)}
+    return {}
+
+_batch_clients = {}
+
+def _batch_client(provider):
+    # Separate from the per-turn clients: a batch needs a longer timeout
+    if provider not in _batch_clients:
+        key = env(API_KEYS[provider])
+        if not key:
+            return None
+        try:
+            from openai import AsyncOpenAI
+            _batch_clients[provider] = AsyncOpenAI(
+                api_key=key,
+                base_url=_base_url(provider),
+                max_retries=0,
+                timeout=float(env("EXTRACTION_BATCH_TIMEOUT_S", "15")),
+            )
+        except Exception as e:
+            print(f"❌ Batch Extract Setup Error ({provider}): {e}")
+            return None
+    return _batch_clients[provider]
 
-def save_cache():
+async def batch_extract(turns, provider, sem=None):
+    """One chat completion for a batch of (text, turn_num); returns one list
+    of memories per turn. Turns the response doesn't cover (or garbles) fall
+    back to per-turn extraction, run concurrently; a failed request falls
+    back to regex. `sem` bounds the batch request and each per-turn call."""
+    single = _SINGLE[provider]
+    sem = sem or asyncio.Semaphore(int(env("EXTRACTION_BATCH_CONCURRENCY", "4")))
+    client = _batch_client(provider)
+    if client is None or not _breakers[provider].allow():
+        return [fallback_extract(text, turn_num) for text, turn_num in turns]
+
+    # Ids are positions in the batch, so they are unique even if turn numbers aren't
+    prompt = BATCH_EXTRACTION_PROMPT.format(turns="\n".join(f"[{j}] {text}" for j, (text, _) in enumerate(turns, 1)))
     try:
-        with open(CACHE_FILE, "w") as f:
-            json.dump(_EXT_CACHE, f)
-    except:
-        pass
+        async with sem:
+            resp = await client.chat.completions.create(
+                model=MODELS[provider],
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.0,
+                max_tokens=min(4000, 100 + int(env("EXTRACTION_BATCH_TOKENS_PER_TURN", "150")) * len(turns)),
+            )
+        data = extract_json(resp.choices[0].message.content)
+        _breakers[provider].record_success()
+    except Exception as e:
+        _breakers[provider].record_failure()
+        print(f"❌ Batch Extract Error ({provider}, {len(turns)} turns): {e}")
+        return [fallback_extract(text, turn_num) for text, turn_num in turns]
+    except BaseException:
+        _breakers[provider].abandon()
+        raise
 
-load_cache()
+    async def retry(text, turn_num):
+        async with sem:
+            return await single(text, turn_num)
 
-async def extract(turn_text, turn_num, provider="grok"):
-    # Check cache first
-    cache_key = f"{turn_num}:{turn_text}"
-    if cache_key in _EXT_CACHE:
-        # Reconstruct MemoryEntry objects from cached data
-        data = _EXT_CACHE[cache_key]
-        return [MemoryEntry(
-            memory_id=str(uuid.uuid4()), # New ID to avoid conflicts
-            type=MemoryType(d["type"]),
-            key=d["key"],
-            value=d["value"],
-            source_turn=d["source_turn"],
-            confidence=d["confidence"],
-            source_text=d["source_text"],
-            meta=d.get("meta", {})
-        ) for d in data]
+    by_id = _per_turn(data)
+    out, missing = [], []
+    for j, (text, turn_num) in enumerate(turns, 1):
+        arr = by_id.get(str(j))
+        if not isinstance(arr, list):
+            # A truncated response usually drops several turns at once
+            missing.append(j - 1)
+            out.append(None)
+            continue
+        # Same contract as the per-turn path: nothing usable -> regex
+        out.append(_parse_items(arr, text, turn_num, provider) or fallback_extract(text, turn_num))
+    for i, mems in zip(missing, await asyncio.gather(*(retry(*turns[i]) for i in missing))):
+        out[i] = mems
+    return out
 
-    provider = env("EXTRACTOR_PROVIDER", provider).lower().strip()
-    if provider == "grok":
-        res = await grok_extract(turn_text, turn_num)
-    elif provider == "groq":
-        res = await groq_extract(turn_text, turn_num)
-    else:
-        res = fallback_extract(turn_text, turn_num)
-    
-    # Cache the result (serialize MemoryEntry objects)
-    serialized = [{
+# Bump when EXTRACTION_PROMPT (or the parsing of its output) changes
+PROMPT_VERSION = 1
+
+_extraction_cache = None
+
+def extraction_cache():
+    global _extraction_cache
+    if _extraction_cache is None:
+        _extraction_cache = ExtractionCache(
+            path=env("EXTRACTION_CACHE_PATH", "artifacts/extraction_cache.sqlite"),
+            lru_size=int(env("EXTRACTION_CACHE_LRU", "10000")),
+            max_entries=int(env("EXTRACTION_CACHE_MAX", "200000")),
+            ttl_s=float(env("EXTRACTION_CACHE_TTL_S", str(30 * 86400))),
+        )
+    return _extraction_cache
+
+def _from_cache(items, turn_text, turn_num):
+    # Cached items are turn-independent; stamp this turn back on
+    return [MemoryEntry(
+        memory_id=str(uuid.uuid4()),
+        type=MemoryType(d["type"]),
+        key=d["key"],
+        value=d["value"],
+        source_turn=turn_num,
+        confidence=d["confidence"],
+        source_text=turn_text[:240],
+        meta=d.get("meta", {})
+    ) for d in items]
+
+def _to_cache(mems):
+    return [{
         "type": m.type.value,
         "key": m.key,
         "value": m.value,
-        "source_turn": m.source_turn,
         "confidence": m.confidence,
-        "source_text": m.source_text,
         "meta": m.meta
-    } for m in res]
-    
-    _EXT_CACHE[cache_key] = serialized
-    if turn_num % 10 == 0: # Save periodically
-        save_cache()
-    
+    } for m in mems]
+
+_SINGLE = {"grok": grok_extract, "groq": groq_extract}
+
+def hedge_delay_ms(provider):
+    """p95 of recent `provider` latency, clamped to [EXTRACTION_HEDGE_MIN_MS,
+    EXTRACTION_HEDGE_MAX_MS]; EXTRACTION_HEDGE_DELAY_MS until there are enough samples."""
+    p95 = _llm_latency.percentile(provider, 95, min_count=20)
+    if p95 is None:
+        return float(env("EXTRACTION_HEDGE_DELAY_MS", "300"))
+    return min(max(p95, float(env("EXTRACTION_HEDGE_MIN_MS", "50"))), float(env("EXTRACTION_HEDGE_MAX_MS", "800")))
+
+_hedge_tasks = set()
+_hedge_stats = {"requests": 0, "hedged": 0, "secondary_wins": 0}
+
+def _background(task, late=None):
+    # Losers run to completion (their request is already out): they still
+    # report to their breaker and latency window, and aren't left half-open
+    _hedge_tasks.add(task)
+    task.add_done_callback(_hedge_tasks.discard)
+    if late is not None:
+        task.add_done_callback(lambda t: t.cancelled() or t.exception() or late(t.result()))
+
+async def hedged_extract(turn_text, turn_num, provider, late=None):
+    """Per-turn extraction that also fires EXTRACTION_HEDGE_TO (the other
+    provider, or "regex") if `provider` hasn't answered within
+    hedge_delay_ms(provider); the first result wins. `late` gets the
+    primary's result if it finishes after losing."""
+    secondary = env("EXTRACTION_HEDGE_TO", "regex").lower().strip()
+    _hedge_stats["requests"] += 1
+    primary = asyncio.ensure_future(_SINGLE[provider](turn_text, turn_num))
+    done, _ = await asyncio.wait({primary}, timeout=hedge_delay_ms(provider) / 1000)
+    if done:
+        return primary.result()
+    _hedge_stats["hedged"] += 1
+    _background(primary, late)
+    if secondary not in _SINGLE or secondary == provider:
+        _hedge_stats["secondary_wins"] += 1
+        return fallback_extract(turn_text, turn_num)
+    backup = asyncio.ensure_future(_SINGLE[secondary](turn_text, turn_num))
+    done, _ = await asyncio.wait({primary, backup}, return_when=asyncio.FIRST_COMPLETED)
+    if primary in done:
+        _background(backup)
+        return primary.result()
+    _hedge_stats["secondary_wins"] += 1
+    return backup.result()
+
+def resilience_stats():
+    return {
+        "breakers": {p: b.stats() for p, b in _breakers.items()},
+        "latency": {p: _llm_latency.percentile(p, 95) for p in MODELS},
+        "hedging": dict(_hedge_stats, enabled=env("EXTRACTION_HEDGE", "0") == "1"),
+    }
+
+async def extract(turn_text, turn_num, provider="grok"):
+    provider = env("EXTRACTOR_PROVIDER", provider).lower().strip()
+    if provider not in MODELS:
+        # Compiled regex extraction is cheaper than a cache lookup
+        return fallback_extract(turn_text, turn_num)
+
+    cache = extraction_cache()
+    h = cache.key(provider, MODELS[provider], PROMPT_VERSION, turn_text)
+    items = cache.get_ram(h)
+    if items is None:
+        items = await asyncio.to_thread(cache.get_disk, h)
+    if items is not None:
+        return _from_cache(items, turn_text, turn_num)
+
+    # Only cache what the model produced: regex fallbacks (API down, circuit
+    # open, hedge won by the other provider) should get another chance at the model next time
+    def remember(res):
+        if res and all(m.meta.get("extractor") == provider for m in res):
+            cache.put(h, provider, _to_cache(res))
+
+    if env("EXTRACTION_HEDGE", "0") == "1":
+        res = await hedged_extract(turn_text, turn_num, provider, late=remember)
+    else:
+        res = await _SINGLE[provider](turn_text, turn_num)
+    remember(res)
     return res
+
+async def extract_many(turns, provider="grok"):
+    """Extract [(turn_text, turn_num)] in turn order, packing cache misses
+    into multi-turn LLM requests of at most EXTRACTION_BATCH_TURNS turns /
+    EXTRACTION_BATCH_TOKENS prompt tokens, EXTRACTION_BATCH_CONCURRENCY at a time."""
+    turns = list(turns)
+    provider = env("EXTRACTOR_PROVIDER", provider).lower().strip()
+    if provider not in MODELS:
+        return [fallback_extract(text, turn_num) for text, turn_num in turns]
+
+    cache = extraction_cache()
+    keys = [cache.key(provider, MODELS[provider], PROMPT_VERSION, text) for text, _ in turns]
+    results = [None] * len(turns)
+    for i, h in enumerate(keys):
+        items = cache.get_ram(h)
+        if items is not None:
+            results[i] = _from_cache(items, *turns[i])
+    todo = [i for i, r in enumerate(results) if r is None]
+    if todo:
+        disk = await asyncio.to_thread(lambda: [cache.get_disk(keys[i]) for i in todo])
+        for i, items in zip(todo, disk):
+            if items is not None:
+                results[i] = _from_cache(items, *turns[i])
+    todo = [i for i, r in enumerate(results) if r is None]
+
+    max_turns = int(env("EXTRACTION_BATCH_TURNS", "16"))
+    max_tokens = int(env("EXTRACTION_BATCH_TOKENS", "2000"))
+    sem = asyncio.Semaphore(int(env("EXTRACTION_BATCH_CONCURRENCY", "4")))
+
+    async def run(idxs):
+        res = await batch_extract([turns[i] for i in idxs], provider, sem)
+        for i, mems in zip(idxs, res):
+            results[i] = mems
+            if mems and all(m.meta.get("extractor") == provider for m in mems):
+                cache.put(keys[i], provider, _to_cache(mems))
+
+    # Batch over positions so each result lands in its own slot
+    pending = [(turns[i][0], i) for i in todo]
+    await asyncio.gather(*(run([i for _, i in b]) for b in _batches(pending, max_turns, max_tokens)))
+    return results
@@ -0,0 +1,183 @@
+import json, math, os, re, threading
+from collections import Counter
+import numpy as np
+
+TOKEN_RE = re.compile(r"[^\W_]+")
+
+# Bump when tokenization or term weighting changes; older saved indexes are rebuilt
+FORMAT_VERSION = 2
+
+# Below this many documents every term is scored (df ratios are meaningless)
+MAX_DF_MIN_DOCS = 100
+
+def tokenize(text):
+    # "call_time=after 9 am" -> ["call", "time", "after", "9", "am"]
+    return TOKEN_RE.findall(text.casefold())
+
+def memory_terms(m, source_weight=0.5):
+    """Term weights for a memory: key/value tokens count 1 each, tokens of
+    the source turn `source_weight` each (0 leaves the turn out)."""
+    terms = Counter(tokenize(f"{m.key} {m.value}"))
+    if source_weight and m.source_text:
+        for term, tf in Counter(tokenize(m.source_text)).items():
+            terms[term] += source_weight * tf
+    return terms
+
+class BM25Index:
+    """In-process BM25 inverted index over memory key/value (and, at a lower
+    weight, source_text).
+
+    Updated incrementally alongside the vector index, so exact tokens
+    (codes, times, names) are matched without an embedding. Documents live
+    in dense slots; each term's postings are cached as NumPy arrays so a
+    query is scored with array ops. Terms in more than `max_df` of the
+    documents ("i", "my", ...) carry almost no idf and are skipped.
+    """
+
+    def __init__(self, k1=1.2, b=0.75, source_weight=0.5, max_df=0.5):
+        self.k1 = k1
+        self.b = b
+        self.source_weight = source_weight
+        self.max_df = max_df
+        self._docs = {}       # memory_id -> Counter(term -> weighted tf)
+        self._slot = {}       # memory_id -> slot
+        self._slot_mids = []  # slot -> memory_id (None if free)
+        self._free = []
+        self._lens = np.zeros(1024, dtype="float64")
+        self._postings = {}   # term -> {slot: tf}
+        self._arrays = {}     # term -> (slots, tfs), rebuilt lazily after a change
+        self._total_len = 0.0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._docs)
+
+    @property
+    def ids(self):
+        return list(self._docs)
+
+    def add_or_update(self, memories):
+        with self._lock:
+            for m in memories:
+                self._insert(m.memory_id, memory_terms(m, self.source_weight))
+
+    def _insert(self, mid, terms):
+        self._drop(mid)
+        if self._free:
+            slot = self._free.pop()
+            self._slot_mids[slot] = mid
+        else:
+            slot = len(self._slot_mids)
+            self._slot_mids.append(mid)
+            if slot >= len(self._lens):
+                self._lens = np.concatenate([self._lens, np.zeros(len(self._lens), dtype="float64")])
+        self._docs[mid] = terms
+        self._slot[mid] = slot
+        self._lens[slot] = sum(terms.values())
+        self._total_len += self._lens[slot]
+        for term, tf in terms.items():
+            self._postings.setdefault(term, {})[slot] = tf
+            self._arrays.pop(term, None)
+
+    def _drop(self, mid):
+        terms = self._docs.pop(mid, None)
+        if terms is None:
+            return
+        slot = self._slot.pop(mid)
+        self._total_len -= self._lens[slot]
+        self._lens[slot] = 0.0
+        self._slot_mids[slot] = None
+        self._free.append(slot)
+        for term in terms:
+            posting = self._postings[term]
+            del posting[slot]
+            self._arrays.pop(term, None)
+            if not posting:
+                del self._postings[term]
+
+    def remove(self, memory_ids):
+        with self._lock:
+            for mid in memory_ids:
+                self._drop(mid)
+
+    def clear(self):
+        with self._lock:
+            self._docs.clear()
+            self._slot.clear()
+            self._slot_mids = []
+            self._free = []
+            self._lens[:] = 0.0
+            self._postings.clear()
+            self._arrays.clear()
+            self._total_len = 0.0
+
+    def _posting_arrays(self, term):
+        arrays = self._arrays.get(term)
+        if arrays is None:
+            posting = self._postings[term]
+            arrays = self._arrays[term] = (
+                np.fromiter(posting.keys(), dtype="int64", count=len(posting)),
+                np.fromiter(posting.values(), dtype="float64", count=len(posting)),
+            )
+        return arrays
+
+    def search(self, query, top_k=30):
+        """[(memory_id, bm25 score)] best first; empty if no query term is indexed."""
+        with self._lock:
+            n = len(self._docs)
+            if not n:
+                return []
+            avg_len = self._total_len / n or 1.0
+            max_df = self.max_df * n if n >= MAX_DF_MIN_DOCS else n
+            acc = None
+            for term in set(tokenize(query)):
+                posting = self._postings.get(term)
+                if not posting or len(posting) > max_df:
+                    continue
+                df = len(posting)
+                idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+                slots, tf = self._posting_arrays(term)
+                norm = self.k1 * (1 - self.b + self.b * self._lens[slots] / avg_len)
+                if acc is None:
+                    acc = np.zeros(len(self._slot_mids), dtype="float64")
+                # Slots are unique within a posting, so fancy-index += is safe
+                acc[slots] += idf * tf * (self.k1 + 1) / (tf + norm)
+            if acc is None:
+                return []
+            hit = np.flatnonzero(acc)
+            if len(hit) > top_k:
+                hit = hit[np.argpartition(-acc[hit], top_k - 1)[:top_k]]
+            hit = hit[np.argsort(-acc[hit], kind="stable")]
+            return [(self._slot_mids[s], float(acc[s])) for s in hit]
+
+    def save(self, path):
+        with self._lock:
+            data = {
+                "version": FORMAT_VERSION,
+                "source_weight": self.source_weight,
+                "docs": {mid: dict(terms) for mid, terms in self._docs.items()},
+            }
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+
+    def load(self, path):
+        """Replace the index with a saved one; returns False if there is none
+        (or it was built with other term weights)."""
+        if not os.path.exists(path):
+            return False
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"⚠️ Failed to load lexical index: {e}")
+            return False
+        if data.get("version") != FORMAT_VERSION or data.get("source_weight") != self.source_weight:
+            print("⚠️ Lexical index was built with other term weights, rebuilding.")
+            return False
+        with self._lock:
+            self.clear()
+            for mid, terms in data["docs"].items():
+                self._insert(mid, Counter(terms))
+        return True
@@ -1,15 +1,18 @@
 
 from typing import List, Tuple
-from rapidfuzz import fuzz
+from rapidfuzz import fuzz, process
 
 def rerank(query, candidates):
     """Multi-signal reranking: fuzzy + term overlap + type coherence"""
     scored = []
     query_terms = set(query.lower().split())
     
-    for mid, text, base in candidates:
+    # Signal 1 for all candidates in one C-level batch
+    fuzzy = process.cdist([query.lower()], [text.lower() for _, text, _ in candidates], scorer=fuzz.token_set_ratio)[0]
+    
+    for (mid, text, base), f in zip(candidates, fuzzy):
         # Signal 1: Fuzzy keyword matching
-        f = fuzz.token_set_ratio(query.lower(), text.lower()) / 100.0
+        f = float(f) / 100.0
         
         # Signal 2: Term overlap
         text_terms = set(text.lower().split())
@@ -1,6 +1,6 @@
-import sqlite3, os
+import sqlite3, os, threading, json, zlib
 from typing import Iterable, List, Optional
-from .types import MemoryEntry, MemoryType
+from .types import MemoryEntry, MemoryRecord
 
 SCHEMA = """
 CREATE TABLE IF NOT EXISTS memories (
@@ -15,8 +15,30 @@ CREATE TABLE IF NOT EXISTS memories (
   use_count INTEGER DEFAULT 0
 );
 CREATE INDEX IF NOT EXISTS idx_memories_type_key ON memories(type, key);
+-- Winning version of each (type, key), maintained at write time
+CREATE TABLE IF NOT EXISTS current_values (
+  type TEXT NOT NULL,
+  key TEXT NOT NULL,
+  memory_id TEXT NOT NULL,
+  boosted INTEGER DEFAULT 0,
+  PRIMARY KEY (type, key)
+);
+-- Expired memories moved out of the hot tables; data is the row as JSON,
+-- zlib-compressed when codec = 'zlib'
+CREATE TABLE IF NOT EXISTS archived_memories (
+  memory_id TEXT PRIMARY KEY,
+  type TEXT NOT NULL,
+  key TEXT NOT NULL,
+  archived_turn INTEGER NOT NULL,
+  codec TEXT NOT NULL,
+  data BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_archived_type_key ON archived_memories(type, key);
 """
 
+COLUMNS = "memory_id, type, key, value, source_turn, confidence, source_text, last_used_turn, use_count"
+
+
 class SQLiteMemoryStore:
     def __init__(self, path="artifacts/memory.sqlite"):
         os.makedirs("artifacts", exist_ok=True)
@@ -25,21 +47,182 @@ class SQLiteMemoryStore:
         self.conn.execute("PRAGMA journal_mode=WAL;")
         self.conn.executescript(SCHEMA)
         self.conn.commit()
+        # One connection is shared by request threads and background writers;
+        # serialize write transactions so commits don't interleave.
+        self.lock = threading.RLock()
 
-    def upsert_many(self, memories: Iterable[MemoryEntry]):
-        cur = self.conn.cursor()
-        for m in memories:
-            cur.execute("""
-            INSERT INTO memories(memory_id, type, key, value, source_turn, confidence, source_text, last_used_turn, use_count)
-            VALUES(?,?,?,?,?,?,?,?,?)
-            ON CONFLICT(memory_id) DO UPDATE SET value=excluded.value
-            """, (m.memory_id, m.type.value, m.key, m.value, m.source_turn, float(m.confidence), m.source_text, m.last_used_turn, m.use_count))
-        self.conn.commit()
+    def upsert_many(self, memories: Iterable[MemoryEntry], current=None):
+        """Insert memories; `current` optionally carries (type, key, memory_id,
+        boosted) winner rows written in the same transaction."""
+        with self.lock:
+            cur = self.conn.cursor()
+            for m in memories:
+                cur.execute("""
+                INSERT INTO memories(memory_id, type, key, value, source_turn, confidence, source_text, last_used_turn, use_count)
+                VALUES(?,?,?,?,?,?,?,?,?)
+                ON CONFLICT(memory_id) DO UPDATE SET value=excluded.value
+                """, (m.memory_id, m.type.value, m.key, m.value, m.source_turn, float(m.confidence), m.source_text, m.last_used_turn, m.use_count))
+            if current:
+                self._set_current(cur, current)
+            self.conn.commit()
+
+    def _set_current(self, cur, rows):
+        cur.executemany("""
+        INSERT INTO current_values(type, key, memory_id, boosted) VALUES(?,?,?,?)
+        ON CONFLICT(type, key) DO UPDATE SET memory_id=excluded.memory_id, boosted=excluded.boosted
+        """, [(t, k, mid, int(b)) for t, k, mid, b in rows])
 
     def all(self):
-        cur = self.conn.cursor()
-        rows = cur.execute("SELECT memory_id, type, key, value, source_turn, confidence, source_text, last_used_turn, use_count FROM memories").fetchall()
-        return [MemoryEntry(memory_id=r[0], type=MemoryType(r[1]), key=r[2], value=r[3], source_turn=r[4], confidence=r[5], source_text=r[6] or "", last_used_turn=r[7], use_count=r[8] or 0) for r in rows]
+        # Stream rows straight into records instead of materializing a tuple list first
+        return [MemoryRecord.from_row(r) for r in self.conn.execute(f"SELECT {COLUMNS} FROM memories ORDER BY rowid")]
+
+    def versions(self, mtype, key):
+        """Every stored version of one (type, key), in write order."""
+        rows = self.conn.execute(f"SELECT {COLUMNS} FROM memories WHERE type = ? AND key = ? ORDER BY rowid", (mtype, key)).fetchall()
+        return [MemoryRecord.from_row(r) for r in rows]
+
+    def current(self):
+        """{(type, key): (memory_id, boosted)} for the winning version of each key."""
+        rows = self.conn.execute("SELECT type, key, memory_id, boosted FROM current_values").fetchall()
+        return {(r[0], r[1]): (r[2], bool(r[3])) for r in rows}
+
+    def replace_current(self, rows):
+        with self.lock:
+            cur = self.conn.cursor()
+            cur.execute("DELETE FROM current_values")
+            self._set_current(cur, rows)
+            self.conn.commit()
+
+    def delete_current(self, keys):
+        with self.lock:
+            self.conn.executemany("DELETE FROM current_values WHERE type = ? AND key = ?", list(keys))
+            self.conn.commit()
+
+    def add_usage(self, rows):
+        """Increment-only usage update: rows are (memory_id, uses, last_used_turn)."""
+        with self.lock:
+            self.conn.executemany("""
+            UPDATE memories
+            SET use_count = COALESCE(use_count, 0) + ?,
+                last_used_turn = MAX(COALESCE(last_used_turn, 0), ?)
+            WHERE memory_id = ?
+            """, [(uses, turn, mid) for mid, uses, turn in rows])
+            self.conn.commit()
+
+    def archive_keys(self, keys, turn, compress=True):
+        """Move every version of each (type, key) into archived_memories.
+
+        Returns the number of rows archived.
+        """
+        codec = "zlib" if compress else "json"
+        n = 0
+        with self.lock:
+            cur = self.conn.cursor()
+            for mtype, key in keys:
+                rows = cur.execute(f"SELECT {COLUMNS} FROM memories WHERE type = ? AND key = ?", (mtype, key)).fetchall()
+                archived = []
+                for r in rows:
+                    data = json.dumps(r).encode("utf-8")
+                    archived.append((r[0], r[1], r[2], turn, codec, zlib.compress(data) if compress else data))
+                cur.executemany("""
+                INSERT OR REPLACE INTO archived_memories(memory_id, type, key, archived_turn, codec, data)
+                VALUES(?,?,?,?,?,?)
+                """, archived)
+                cur.execute("DELETE FROM memories WHERE type = ? AND key = ?", (mtype, key))
+                cur.execute("DELETE FROM current_values WHERE type = ? AND key = ?", (mtype, key))
+                n += len(rows)
+            self.conn.commit()
+        return n
+
+    def archived(self, mtype=None, key=None, limit=100):
+        """Archived memories, most recently archived first."""
+        where, args = [], []
+        if mtype is not None:
+            where.append("type = ?")
+            args.append(mtype)
+        if key is not None:
+            where.append("key = ?")
+            args.append(key)
+        sql = "SELECT codec, data FROM archived_memories"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        rows = self.conn.execute(sql + " ORDER BY rowid DESC LIMIT ?", (*args, limit)).fetchall()
+        return [MemoryRecord.from_row(json.loads(zlib.decompress(data) if codec == "zlib" else data)) for codec, data in rows]
+
+    def archived_count(self):
+        return int(self.conn.execute("SELECT COUNT(*) FROM archived_memories").fetchone()[0])
+
+    def max_archived_turn(self):
+        """Latest turn at which anything was archived (0 if nothing was)."""
+        return int(self.conn.execute("SELECT COALESCE(MAX(archived_turn), 0) FROM archived_memories").fetchone()[0])
+
+    def delete_many(self, memory_ids):
+        with self.lock:
+            self.conn.executemany("DELETE FROM memories WHERE memory_id = ?", [(mid,) for mid in memory_ids])
+            self.conn.commit()
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute("DELETE FROM memories")
+            self.conn.execute("DELETE FROM current_values")
+            self.conn.execute("DELETE FROM archived_memories")
+            self.conn.commit()
 
     def close(self):
         self.conn.close()
+
+
+class UsageWriter:
+    """Write-behind buffer for retrieval usage stats.
+
+    `record` only touches an in-memory dict; a background thread flushes the
+    accumulated increments in one transaction every `interval_ms`, or sooner
+    once `max_pending` memories are waiting.
+    """
+
+    def __init__(self, store, interval_ms=500, max_pending=256):
+        self.store = store
+        self.interval = interval_ms / 1000.0
+        self.max_pending = max_pending
+        self._pending = {}   # memory_id -> [uses, last_used_turn]
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+        self.flushes = 0
+        self._thread = threading.Thread(target=self._run, name="usage-writer", daemon=True)
+        self._thread.start()
+
+    def record(self, memory_ids, turn):
+        with self._lock:
+            for mid in memory_ids:
+                entry = self._pending.get(mid)
+                if entry is None:
+                    self._pending[mid] = [1, turn]
+                else:
+                    entry[0] += 1
+                    entry[1] = max(entry[1], turn)
+            full = len(self._pending) >= self.max_pending
+        if full:
+            self._wake.set()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if pending:
+            self.store.add_usage([(mid, uses, turn) for mid, (uses, turn) in pending.items()])
+            self.flushes += 1
+
+    def _run(self):
+        while not self._stopped:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"⚠️ UsageWriter: flush failed: {e}")
+
+    def close(self):
+        self._stopped = True
+        self._wake.set()
+        self._thread.join(timeout=5)
+        self.flush()
@@ -1,18 +1,40 @@
 from typing import Dict, List
 import os
+import math
 import asyncio
-from .types import MemoryEntry, RetrievedMemory
-from .extractors import extract
-from .store_sqlite import SQLiteMemoryStore
-from .vector_index import VectorIndex
-from .utils import exp_decay, Timer
+import threading
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from .types import MemoryEntry, MemoryRecord, RetrievedMemory
+from .extractors import extract, extract_many
+from .store_sqlite import SQLiteMemoryStore, UsageWriter
+from .embed_cache import EmbeddingCache, RetrievalResultCache, normalize_query
+from .lexical import BM25Index
+from .utils import Timer, StageTimer, LatencyHistograms
 from .rerank import rerank
 from .inject import format_injection
 
+def supersedes(new, old):
+    """Conflict rule shared by write-time and query-time resolution.
+
+    Returns (wins, boosted): prefer significantly higher confidence (> 0.1),
+    otherwise with similar confidence prefer the NEWER memory, flagged as
+    boosted to reflect "current truth".
+    """
+    conf_diff = new.confidence - old.confidence
+    if conf_diff > 0.1:
+        return True, False
+    if conf_diff >= -0.1 and new.source_turn > old.source_turn:
+        return True, True
+    return False, False
+
 class MemorySystem:
-    def __init__(self, config):
+    def __init__(self, config, lazy=False, shared=None):
         print(f"🔍 MemorySystem: Initializing with config: {list(config.keys())}")
         self.cfg = config
+        # Another MemorySystem whose embedding model, embedding cache and
+        # thread pools this one reuses (one per tenant, see tenants.py)
+        self._shared = shared
         self.embedding_dim = 384
         
         # Load Models
@@ -48,120 +70,597 @@ class MemorySystem:
         db_path = self.cfg.get("storage", {}).get("path", "artifacts/memory.sqlite")
         print(f"🔍 MemorySystem: Initializing SQLiteMemoryStore at {db_path}")
         self.store = SQLiteMemoryStore(path=db_path)
+        # Usage counters are written behind the read path, in batches
+        ucfg = self.cfg["memory"].get("usage_flush", {})
+        self.usage = UsageWriter(self.store, interval_ms=ucfg.get("interval_ms", 500), max_pending=ucfg.get("max_pending", 256))
+        # Bounded pools for aretrieve: FAISS + ranking, and the model forward
+        # pass when vector.batching is off (otherwise the encoder is awaited)
+        xcfg = self.cfg["memory"].get("executors", {})
+        if shared is not None:
+            self._embed_pool, self._search_pool = shared._embed_pool, shared._search_pool
+        else:
+            self._embed_pool = ThreadPoolExecutor(max_workers=xcfg.get("embed_workers", 2), thread_name_prefix="embed")
+            self._search_pool = ThreadPoolExecutor(max_workers=xcfg.get("search_workers", 4), thread_name_prefix="search")
         print("🔍 MemorySystem: Initializing VectorIndex...")
-        self.vindex = VectorIndex(self.cfg["vector"]["embedding_model"])
+        ecfg = self.cfg["vector"].get("embedding_cache", {})
+        self.embed_cache = None
+        if shared is not None:
+            self.embed_cache = shared.embed_cache
+        elif ecfg.get("enabled", True):
+            self.embed_cache = EmbeddingCache(
+                path=ecfg.get("path", os.path.join(os.path.dirname(db_path) or ".", "embedding_cache.sqlite")),
+                model_name=self.cfg["vector"]["embedding_model"],
+                lru_size=ecfg.get("lru_size", 50000),
+                precision=self.cfg["vector"].get("precision", "float32"),
+            )
+        # Index snapshot lives next to the SQLite file (e.g. memory.sqlite.faiss)
+        self.snapshot_path = db_path + ".faiss" if self.cfg["vector"].get("snapshot", True) else None
+        self.vindex = None
+        # BM25 over key/value/source_text, fused with the FAISS hits in _rank
+        lcfg = self.cfg["memory"].get("lexical", {})
+        self.lexical = BM25Index(
+            k1=lcfg.get("k1", 1.2), b=lcfg.get("b", 0.75),
+            source_weight=lcfg.get("source_weight", 0.5), max_df=lcfg.get("max_df", 0.5),
+        ) if lcfg.get("enabled", True) else None
+        self.lexical_path = db_path + ".bm25.json" if self.snapshot_path and self.lexical is not None else None
         self.turn = 0
+        # Only the current winner of each (type, key) is cached and indexed
         self._memory_cache = {}
+        self._current = {}      # (type, key) -> winning memory_id
+        self._boosted = set()   # winners that displaced an older version by recency
+        self._write_lock = threading.Lock()
+        # Per-stage latency; attached to results only when memory.timings.attach
+        tcfg = self.cfg["memory"].get("timings", {})
+        self.attach_timings = tcfg.get("attach", False)
+        self.latency = LatencyHistograms(window=tcfg.get("window", 1000))
+        # Bumped on every mutation; part of the result cache key
+        self._epoch = 0
+        rcfg = self.cfg["memory"].get("result_cache", {})
+        self.result_cache = RetrievalResultCache(size=rcfg.get("size", 1024)) if rcfg.get("enabled", True) else None
+        self.startup_timings = {}
+        self._ready = threading.Event()
+        self._startup_error = None
+        # Retention: keys past the age/decay cutoff move to the archive table
+        self.retention = self.cfg["memory"].get("retention", {})
+        self._stopping = threading.Event()
+        self._retention_thread = None
+        if self.retention.get("enabled", True) and self.retention.get("interval_s", 60):
+            self._retention_thread = threading.Thread(target=self._retention_loop, name="memory-retention", daemon=True)
+            self._retention_thread.start()
         
         # RESTORE STATE
-        print("🔍 MemorySystem: Rebuilding index...")
-        self._rebuild_index()
-        print("✅ MemorySystem: Initialization complete.")
+        # lazy=True returns immediately and finishes startup in the background;
+        # callers block in wait_ready() (or poll is_ready) until the index is usable.
+        if lazy:
+            threading.Thread(target=self._startup, name="memory-startup", daemon=True).start()
+        else:
+            self._startup()
+            if self._startup_error is not None:
+                raise self._startup_error
+            print("✅ MemorySystem: Initialization complete.")
+
+    @property
+    def is_ready(self):
+        return self._ready.is_set() and self._startup_error is None
+
+    def wait_ready(self, timeout=None):
+        if not self._ready.wait(timeout):
+            raise TimeoutError("MemorySystem is still starting up")
+        if self._startup_error is not None:
+            raise RuntimeError("MemorySystem failed to start") from self._startup_error
+
+    def _timed(self, stage, fn):
+        t = Timer.start()
+        try:
+            return fn()
+        finally:
+            self.startup_timings[stage] = t.ms()
+
+    def _startup(self):
+        """Staged startup: SQLite rows, the embedding model and the index
+        snapshot are loaded concurrently, then merged into a ready index."""
+        t = Timer.start()
+        try:
+            print("🔍 MemorySystem: Loading store, model and index snapshot in parallel...")
+            with ThreadPoolExecutor(max_workers=4, thread_name_prefix="startup") as pool:
+                f_rows = pool.submit(self._timed, "sqlite_ms", self.store.all)
+                f_vindex = pool.submit(self._timed, "model_ms", self._new_vindex)
+                f_snap = pool.submit(self._timed, "snapshot_ms", self._read_snapshot)
+                f_lex = pool.submit(self._timed, "lexical_ms", self._read_lexical)
+                all_mems, self.vindex, snapshot = f_rows.result(), f_vindex.result(), f_snap.result()
+                f_lex.result()
+            self._timed("index_ms", lambda: self._rebuild_index(all_mems, snapshot))
+        except Exception as e:
+            print(f"❌ MemorySystem: Startup failed: {e}")
+            self._startup_error = e
+        finally:
+            self.startup_timings["total_ms"] = t.ms()
+            print(f"⏱️ MemorySystem: time-to-ready {self.startup_timings['total_ms']:.0f} ms {self.startup_timings}")
+            self._ready.set()
+
+    def _read_snapshot(self):
+        if not self.snapshot_path:
+            return None
+        from .vector_index import read_snapshot
+        return read_snapshot(self.snapshot_path)
 
-    def _rebuild_index(self):
-        """Rebuilds the in-memory vector index from SQLite."""
-        all_mems = self.store.all()
+    def _read_lexical(self):
+        if self.lexical_path:
+            self.lexical.load(self.lexical_path)
+
+    def _new_vindex(self):
+        # Deferred: pulls in faiss/torch/sentence_transformers
+        from .vector_index import VectorIndex
+        embedder = None
+        if self._shared is not None:
+            self._shared.wait_ready()
+            embedder = self._shared.vindex.embedder
+        return VectorIndex(
+            self.cfg["vector"]["embedding_model"],
+            cache=self.embed_cache,
+            compaction_threshold=self.cfg["vector"].get("compaction_threshold", 0.2),
+            index_cfg=self.cfg["vector"].get("index", {}),
+            precision=self.cfg["vector"].get("precision", "float32"),
+            backend=self.cfg["vector"].get("backend", "torch"),
+            threads=self.cfg["vector"].get("threads"),
+            batching=self.cfg["vector"].get("batching", {}),
+            query_cache=self.cfg["vector"].get("query_cache", {}),
+            embedder=embedder,
+        )
+
+    def _rebuild_index(self, all_mems, snapshot=None):
+        """Rebuilds the in-memory vector index from SQLite.
+
+        Installs the on-disk index snapshot (if any), drops vectors that are
+        no longer current and only embeds current memories it is missing,
+        instead of re-encoding the whole store.
+        """
+        # Archiving moves memories out of the hot table, so their turns only
+        # survive as archived_turn; without it a fully archived store restarts at 0
+        self.turn = max(self.turn, self.store.max_archived_turn())
         if not all_mems:
             return
             
-        # Restore cache
+        by_id = {}
         for m in all_mems:
-            self._memory_cache[m.memory_id] = m
+            by_id[m.memory_id] = m
             # Track max turn
             if m.source_turn > self.turn:
                 self.turn = m.source_turn
+
+        current = self.store.current()
+        if not current or any(mid not in by_id for mid, _ in current.values()):
+            # First run on an older DB (or rows changed underneath us): replay writes
+            print(f"🔄 Resolving current value per key from {len(all_mems)} memories...")
+            current = self._resolve_current(all_mems)
+            self.store.replace_current([(t, k, mid, b) for (t, k), (mid, b) in current.items()])
         
-        # Re-add to Vector Index
-        # We only need to add them; VectorIndex handles embedding if not cached?
-        # Actually VectorIndex.add_or_update embeds them.
-        # This might be slow on startup for 5000+ items, but it's necessary since we don't save the index.
-        # Optimization: We could pickle the index, but for now, re-embedding or checks is safer.
-        # WAIT: Re-embedding 5000 items on every startup is SLOW (approx 10-20s).
-        # But it's better than data loss.
-        # Ideally we should serialize FAISS.
-        # For this hackathon scope, strict correctness > startup speed.
-        print(f"🔄 Rebuilding Index from {len(all_mems)} memories...")
-        self.vindex.add_or_update(all_mems)
+        # Restore cache
+        for key, (mid, boosted) in current.items():
+            self._current[key] = mid
+            self._memory_cache[mid] = by_id[mid]
+            if boosted:
+                self._boosted.add(mid)
+        
+        if self.lexical is not None:
+            # Loaded from disk (if saved); reconcile with the current winners
+            self.lexical.remove([mid for mid in self.lexical.ids if mid not in self._memory_cache])
+            indexed = set(self.lexical.ids)
+            self.lexical.add_or_update([m for mid, m in self._memory_cache.items() if mid not in indexed])
+
+        if snapshot is not None and self.vindex.install(snapshot):
+            self.vindex.index_metadata(self._memory_cache.values())
+            # Superseded or deleted since the snapshot was taken
+            self.vindex.remove([mid for mid in self.vindex.ids if mid not in self._memory_cache])
+            indexed = set(self.vindex.ids)
+            missing = [m for mid, m in self._memory_cache.items() if mid not in indexed]
+            print(f"🔄 Loaded index snapshot ({len(self.vindex)} vectors), embedding {len(missing)} new memories...")
+            if not missing:
+                print("✅ Index Restored.")
+                return
+        else:
+            missing = list(self._memory_cache.values())
+            print(f"🔄 Rebuilding Index from {len(missing)} current memories ({len(all_mems)} stored)...")
+        self.vindex.add_or_update(missing)
+        self.save_snapshot()
         print("✅ Index Rebuilt.")
 
+    @staticmethod
+    def _resolve_current(memories):
+        """Fold memories in write order into {(type, key): (memory_id, boosted)}."""
+        winners = {}
+        for m in memories:
+            key = (m.type.value, m.key)
+            cur = winners.get(key)
+            if cur is None:
+                winners[key] = (m, False)
+                continue
+            wins, boosted = supersedes(m, cur[0])
+            if wins:
+                winners[key] = (m, boosted)
+        return {key: (m.memory_id, boosted) for key, (m, boosted) in winners.items()}
+
+    def save_snapshot(self):
+        """Persist the vector index so the next startup can skip re-embedding."""
+        # Not is_ready: _rebuild_index saves during startup, before _ready is set
+        if not self.snapshot_path or self.vindex is None or self._startup_error is not None:
+            return
+        try:
+            self.vindex.save(self.snapshot_path)
+            if self.lexical_path:
+                self.lexical.save(self.lexical_path)
+        except Exception as e:
+            print(f"⚠️ Failed to save index snapshot: {e}")
+
+    def drop_snapshot(self):
+        if not self.snapshot_path:
+            return
+        for p in (self.snapshot_path, self.snapshot_path + ".meta.json", self.lexical_path):
+            if p and os.path.exists(p):
+                os.remove(p)
+
     async def process_turn(self, user_text):
+        # The turn clock is restored from the store during startup
+        if not self.is_ready:
+            await asyncio.to_thread(self.wait_ready)
         self.turn += 1
-        t_extract = Timer.start()
+        st = StageTimer()
         
         # Async Extraction (Network Bound - Fine)
-        extracted = await extract(user_text, self.turn)
-        extract_ms = t_extract.ms()
+        with st.stage("extract"):
+            extracted = await extract(user_text, self.turn)
+        extract_ms = st.timings["extract"]
         
         # Offload Blocking I/O and CPU work to ThreadPool
         # This prevents blocking the FastAPI Event Loop during Injection
         if extracted:
-            await asyncio.to_thread(self._persist_memories, extracted)
+            with st.stage("persist"):
+                await asyncio.to_thread(self._persist_memories, extracted)
             
-        return {"turn": self.turn, "extracted": extracted, "extract_ms": extract_ms}
+        result = {"turn": self.turn, "extracted": extracted, "extract_ms": extract_ms}
+        return self._with_timings(result, st)
+
+    async def process_turns(self, texts):
+        """`process_turn` for a batch of consecutive turns: extraction is
+        packed into multi-turn LLM requests and the memories are written in
+        turn order in one pass."""
+        if not self.is_ready:
+            await asyncio.to_thread(self.wait_ready)
+        texts = list(texts)
+        first = self.turn + 1
+        self.turn += len(texts)
+        st = StageTimer()
+        with st.stage("extract"):
+            extracted = await extract_many([(text, first + i) for i, text in enumerate(texts)])
+        flat = [m for mems in extracted for m in mems]
+        if flat:
+            with st.stage("persist"):
+                await asyncio.to_thread(self._persist_memories, flat)
+        self.latency.record(st.timings)
+        extract_ms = st.timings["extract"] / max(len(texts), 1)
+        return [{"turn": first + i, "extracted": mems, "extract_ms": extract_ms} for i, mems in enumerate(extracted)]
+
+    async def ingest_many(self, texts, concurrency=None, batch_turns=None, queue_size=None):
+        """Pipelined `process_turn` over a stream of turns.
+
+        Turns are numbered in input order as they are read. `concurrency`
+        extraction tasks run ahead of the writer, which persists finished
+        turns in order, up to `batch_turns` at a time, in one encode call and
+        one SQLite transaction. At most `queue_size` turns are in flight, so
+        a slow writer (or a slow turn at the head) stalls reading `texts`
+        instead of buffering it.
+        """
+        if not self.is_ready:
+            await asyncio.to_thread(self.wait_ready)
+        icfg = self.cfg["memory"].get("ingest", {})
+        concurrency = concurrency or icfg.get("concurrency", 8)
+        batch_turns = batch_turns or icfg.get("batch_turns", 32)
+        queue_size = max(queue_size or icfg.get("queue_size", 128), batch_turns)
+        loop = asyncio.get_running_loop()
+        work = asyncio.Queue(maxsize=concurrency)
+        ordered = asyncio.Queue(maxsize=queue_size)   # (turn, future) in turn order
+        results = []
+        end = object()
+
+        async def read():
+            for text in texts:
+                self.turn += 1
+                fut = loop.create_future()
+                await ordered.put((self.turn, fut))
+                await work.put((text, self.turn, fut))
+            for _ in range(concurrency):
+                await work.put(None)
+            await ordered.put(end)
+
+        async def extract_worker():
+            while True:
+                item = await work.get()
+                if item is None:
+                    return
+                text, turn, fut = item
+                t = loop.time()
+                try:
+                    fut.set_result((await extract(text, turn), (loop.time() - t) * 1000))
+                except Exception as e:
+                    fut.set_exception(e)
+
+        async def write():
+            head = await ordered.get()
+            while head is not end:
+                batch = [(head[0], await head[1])]
+                head = None
+                # Take whatever has already finished behind the head
+                while len(batch) < batch_turns and not ordered.empty():
+                    nxt = ordered.get_nowait()
+                    if nxt is end or not nxt[1].done():
+                        head = nxt
+                        break
+                    batch.append((nxt[0], nxt[1].result()))
+                flat = [m for _, (mems, _) in batch for m in mems]
+                if flat:
+                    st = StageTimer()
+                    with st.stage("persist"):
+                        await asyncio.to_thread(self._persist_memories, flat)
+                    self.latency.record(st.timings)
+                results.extend({"turn": turn, "extracted": mems, "extract_ms": ms} for turn, (mems, ms) in batch)
+                if head is None:
+                    head = await ordered.get()
+
+        tasks = [asyncio.ensure_future(read()), *(asyncio.ensure_future(extract_worker()) for _ in range(concurrency))]
+        try:
+            await write()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        return results
+
+    def _with_timings(self, result, st):
+        self.latency.record(st.timings)
+        if self.attach_timings:
+            result["timings"] = st.timings
+        return result
 
     def _persist_memories(self, extracted):
         # This runs in a separate thread
-        for m in extracted:
-            self._memory_cache[m.memory_id] = m
-        self.store.upsert_many(extracted)
-        self.vindex.add_or_update(extracted)
+        self.wait_ready()
+        extracted = [MemoryRecord.from_entry(m) for m in extracted]
+        with self._write_lock:
+            promoted, demoted, changed = {}, [], {}
+            for m in extracted:
+                key = (m.type.value, m.key)
+                cur_mid = self._current.get(key)
+                cur = self._memory_cache.get(cur_mid) if cur_mid else None
+                boosted = False
+                if cur is not None:
+                    wins, boosted = supersedes(m, cur)
+                    if not wins:
+                        # Stored for history, but never enters the hot index
+                        continue
+                    # Superseded: demoted out of the cache and the vector index
+                    self._memory_cache.pop(cur_mid, None)
+                    self._boosted.discard(cur_mid)
+                    if promoted.pop(cur_mid, None) is None:
+                        demoted.append(cur_mid)
+                self._current[key] = m.memory_id
+                self._memory_cache[m.memory_id] = m
+                if boosted:
+                    self._boosted.add(m.memory_id)
+                promoted[m.memory_id] = m
+                changed[key] = (m.memory_id, boosted)
+            self.store.upsert_many(extracted, current=[(t, k, mid, b) for (t, k), (mid, b) in changed.items()])
+            if demoted:
+                self.vindex.remove(demoted)
+            self.vindex.add_or_update(list(promoted.values()))
+            if self.lexical is not None:
+                self.lexical.remove(demoted)
+                self.lexical.add_or_update(promoted.values())
+            self._bump_epoch()
+
+    def _bump_epoch(self):
+        # Called under _write_lock once the mutation is visible to readers
+        self._epoch += 1
+        if self.result_cache is not None:
+            self.result_cache.clear()
 
     def retrieve(self, query):
+        self.wait_ready()
         cfgm = self.cfg["memory"]
         t = Timer.start()
-        hits = self.vindex.search(query, top_k=max(10, cfgm["top_k"]*3))
-        candidates = []
-        for mid, base_score in hits:
-            m = self._memory_cache.get(mid)
-            if not m:
-                continue
-            age = self.turn - m.source_turn
-            if age > cfgm["max_memory_age_turns"]:
-                continue
-            decay = exp_decay(age, cfgm["decay_lambda"])
-            score = float(base_score) * float(m.confidence) * decay
-            text = f"{m.type.value}|{m.key}={m.value}"
-            candidates.append((mid, text, score))
+        key = self._result_key(query)
+        hit = self._cached_result(key, t)
+        if hit is not None:
+            return hit
+        st = StageTimer()
+        k = max(10, cfgm["top_k"]*3)
+        with st.stage("embed"):
+            q = self.vindex.embed_queries([query])
+        with st.stage("ann_search"):
+            scores, labels = self.vindex.search_vectors(q, top_k=k)
+        hits = self._rank(query, scores[0], labels[0], limit=k * 5, st=st)
+        return self._finish_result(key, hits, t, st)
+
+    def _result_key(self, query):
+        # turn is part of the key too: decay and the age cutoff depend on it
+        if self.result_cache is None:
+            return None
+        cfgm = self.cfg["memory"]
+        return (normalize_query(query), cfgm["top_k"], bool(cfgm.get("rerank", True)), self._epoch, self.turn)
+
+    def _cached_result(self, key, t):
+        hit = self.result_cache.get(key) if key is not None else None
+        if hit is None:
+            return None
+        hits, injected = hit
+        st = StageTimer()
+        st.add("result_cache", t.ms())
+        # Usage is still counted for cache hits
+        with st.stage("persist"):
+            self._touch(hits)
+        result = {"turn": self.turn, "retrieved": self._to_retrieved(hits), "retrieve_ms": st.timings["result_cache"], "injected_context": injected}
+        return self._with_timings(result, st)
+
+    def _finish_result(self, key, hits, t, st, extra_ms=0.0):
+        cfgm = self.cfg["memory"]
+        retrieve_ms = extra_ms + t.ms()
+        with st.stage("inject"):
+            injected = format_injection([m for m, _, _ in hits], max_tokens=cfgm["max_injected_tokens"])
+        if key is not None:
+            self.result_cache.put(key, (hits, injected))
+        with st.stage("persist"):
+            self._touch(hits)
+        result = {"turn": self.turn, "retrieved": self._to_retrieved(hits), "retrieve_ms": retrieve_ms, "injected_context": injected}
+        return self._with_timings(result, st)
+
+    @staticmethod
+    def _to_retrieved(hits):
+        # The API boundary: pydantic objects are only built for returned hits
+        return [RetrievedMemory.model_construct(memory=m.to_entry(), score=score, ranker=ranker) for m, score, ranker in hits]
+
+    async def aretrieve(self, query):
+        """asyncio `retrieve`: same result, but the event loop stays free.
+
+        The query is embedded by awaiting the micro-batching encoder, so
+        concurrent calls share forward passes; FAISS search and ranking run
+        on the bounded search pool. Safe to call concurrently.
+        """
+        if not self._ready.is_set():
+            # Don't block the loop while startup finishes
+            await asyncio.to_thread(self.wait_ready)
+        self.wait_ready()
+        loop = asyncio.get_running_loop()
+        cfgm = self.cfg["memory"]
+        t = Timer.start()
+        key = self._result_key(query)
+        hit = self._cached_result(key, t)
+        if hit is not None:
+            return hit
+        st = StageTimer()
+        k = max(10, cfgm["top_k"]*3)
+        # Stage timings include time spent queued for a pool worker
+        with st.stage("embed"):
+            q = await self.vindex.aembed_queries([query], executor=self._embed_pool)
+        with st.stage("ann_search"):
+            scores, labels = await loop.run_in_executor(self._search_pool, self.vindex.search_vectors, q, k)
+        hits = await loop.run_in_executor(self._search_pool, self._rank, query, scores[0], labels[0], k * 5, st)
+        return self._finish_result(key, hits, t, st)
+
+    def retrieve_many(self, queries):
+        """Batched `retrieve`: one encode + one FAISS search for all queries.
+
+        Returns one result dict per query, identical to calling `retrieve`
+        in a loop.
+        """
+        self.wait_ready()
+        cfgm = self.cfg["memory"]
+        queries = list(queries)
+        results = [None] * len(queries)
+        keys = [self._result_key(q) for q in queries]
+        for i, key in enumerate(keys):
+            results[i] = self._cached_result(key, Timer.start())
+        todo = [i for i, r in enumerate(results) if r is None]
+        if not todo:
+            return results
+
+        shared = StageTimer()
+        k = max(10, cfgm["top_k"]*3)
+        with shared.stage("embed"):
+            q = self.vindex.embed_queries([queries[i] for i in todo])
+        with shared.stage("ann_search"):
+            scores, labels = self.vindex.search_vectors(q, top_k=k)
+        # Amortize the shared encode/search cost across the batch
+        shared_ms = {stage: ms / len(todo) for stage, ms in shared.timings.items()}
+
+        for i, row_scores, row_labels in zip(todo, scores, labels):
+            tq = Timer.start()
+            st = StageTimer()
+            st.timings.update(shared_ms)
+            hits = self._rank(queries[i], row_scores, row_labels, limit=k * 5, st=st)
+            results[i] = self._finish_result(keys[i], hits, tq, st, extra_ms=sum(shared_ms.values()))
+
+        return results
+
+    def _rank(self, query, scores, labels, limit, st=None):
+        """Score, age-filter, conflict-resolve and rerank FAISS hits for one query
+        (fused with BM25 hits when the lexical index is enabled).
+
+        Scoring, filtering and decay run as array ops over the index's
+        metadata columns; only keys hit more than once go through the
+        (order-dependent) conflict-resolution fold.
+        """
+        st = st or StageTimer()
+        with st.stage("candidate_filter"):
+            pos, lab, age, scores = self._filter_candidates(query, scores, labels, limit)
+        if not len(pos):
+            return []
+        with st.stage("resolve"):
+            resolved_candidates = self._resolve_candidates(pos, lab, age, scores)
+        with st.stage("rerank"):
+            return self._order_candidates(query, resolved_candidates)
+
+    def _filter_candidates(self, query, scores, labels, limit):
+        """Live, in-age FAISS (and BM25) hits: (positions, labels, ages, scores)."""
+        cfgm = self.cfg["memory"]
+        cols = self.vindex.columns
+        labels = np.asarray(labels, dtype="int64")
+        # -1 padding, or a label the columns haven't grown to, is never live
+        valid = (labels >= 0) & (labels < len(cols.alive))
+        lab = np.where(valid, labels, 0)
+        live = valid & cols.alive[lab]
+        # Same candidate budget as the tuple-based search: first `limit` live hits
+        live &= np.cumsum(live) <= limit
+        scores = np.asarray(scores, dtype="float64")
+        if self.lexical is not None:
+            lab, live, scores = self._fuse_lexical(query, lab, live, scores)
+        age = self.turn - cols.source_turn[lab]
+        pos = np.nonzero(live & (age <= cfgm["max_memory_age_turns"]))[0]
+        return pos, lab, age, scores
+
+    def _resolve_candidates(self, pos, lab, age, scores):
+        """Decay-weighted scores with one winner per key: [(mid, text, score)]."""
+        cfgm = self.cfg["memory"]
+        cols = self.vindex.columns
+        lab, age = lab[pos], age[pos]
+        conf = cols.confidence[lab]
+        turn = cols.source_turn[lab]
+        score = scores[pos] * conf * np.exp(-cfgm["decay_lambda"] * np.maximum(age, 0))
 
         # CONFLICT RESOLUTION: keep highest-confidence version of each key
-        key_cache = {}
-        for mid, text, score in candidates:
-            m = self._memory_cache[mid]
-            # Key format: TYPE:KEY (e.g., preference:language)
-            key = f"{m.type.value}:{m.key}"
-            
-            # Smart Conflict Resolution:
-            # 1. Prefer significantly higher confidence ( > 0.1 diff)
-            # 2. If confidence is similar, prefer the NEWER memory (Update logic)
-            # 3. Handle explicit negations (if value is "DELETE" or "NULL") - TBD, for now just overwrites
-            
-            if key not in key_cache:
-                key_cache[key] = (mid, text, score)
-            else:
-                curr_mid, _, curr_score = key_cache[key]
-                curr_m = self._memory_cache[curr_mid]
-                
-                # Confidence diff check
-                conf_diff = m.confidence - curr_m.confidence
-                
+        # Key format: TYPE:KEY (e.g., preference:language), interned to key_id
+        key = cols.key_id[lab]
+        _, first, inverse, counts = np.unique(key, return_index=True, return_inverse=True, return_counts=True)
+        winner = first.copy()
+        win_score = score[first]
+        for g in np.nonzero(counts > 1)[0]:
+            members = np.nonzero(inverse == g)[0]
+            w, ws = members[0], score[members[0]]
+            for j in members[1:]:
+                # Smart Conflict Resolution:
+                # 1. Prefer significantly higher confidence ( > 0.1 diff)
+                # 2. If confidence is similar, prefer the NEWER memory (Update logic)
+                #    with a slight score boost to reflect "current truth"
+                conf_diff = conf[j] - conf[w]
                 if conf_diff > 0.1:
-                    # New one is much more confident -> Replace
-                    key_cache[key] = (mid, text, score)
-                elif conf_diff < -0.1:
-                    # Old one is much more confident -> Keep old
-                    pass
-                else:
-                    # Similar confidence: Prefer RECENCY
-                    if m.source_turn > curr_m.source_turn:
-                        # New memory is more recent -> Replace
-                        # Bonus: Boost score slightly for recency to reflect "current truth"
-                        boosted_score = score * 1.1 
-                        key_cache[key] = (mid, text, boosted_score)
-                    else:
-                        # Old memory is more recent (unlikely in this loop order but safe to handle)
-                        pass
-        resolved_candidates = list(key_cache.values())
+                    w, ws = j, score[j]
+                elif conf_diff >= -0.1 and turn[j] > turn[w]:
+                    w, ws = j, score[j] * 1.1
+            winner[g], win_score[g] = w, ws
+
+        # Keep keys in order of first appearance (matters for score ties)
+        resolved_candidates = []
+        for g in np.argsort(first, kind="stable"):
+            mid = self.vindex.memory_id(lab[winner[g]])
+            m = self._memory_cache.get(mid) if mid is not None else None
+            if not m:
+                continue
+            # Winners that displaced an older version by recency keep their boost
+            boost = 1.1 if mid in self._boosted else 1.0
+            resolved_candidates.append((mid, f"{m.type.value}|{m.key}={m.value}", float(win_score[g]) * boost))
+        return resolved_candidates
 
+    def _order_candidates(self, query, resolved_candidates):
+        """Rerank (or sort by score) and keep the top_k as (record, score, ranker)."""
+        cfgm = self.cfg["memory"]
         if cfgm.get("rerank", True) and resolved_candidates:
             rr = rerank(query, resolved_candidates)
             ranked = rr[: cfgm["top_k"]]
@@ -175,26 +674,183 @@ class MemorySystem:
             score_map = {mid: s for mid, _, s in top}
             ordered_ids = [mid for mid, _, _ in top]
 
-        retrieved = []
+        hits = []
         for mid in ordered_ids:
             m = self._memory_cache.get(mid)
             if not m:
                 continue
-            retrieved.append(RetrievedMemory(memory=m, score=score_map[mid], ranker=ranker_name))
+            hits.append((m, score_map[mid], ranker_name))
+        return hits
 
-        retrieve_ms = t.ms()
-        injected = format_injection([r.memory for r in retrieved], max_tokens=cfgm["max_injected_tokens"])
-        
-        # POLISH: Update usage stats
-        to_update = []
-        for r in retrieved:
-            r.memory.use_count += 1
-            r.memory.last_used_turn = self.turn
-            to_update.append(r.memory)
-        if to_update:
-            self.store.upsert_many(to_update)
+    def _fuse_lexical(self, query, lab, live, scores):
+        """Weighted fusion of BM25 hits into the dense candidates.
+
+        Each BM25 hit adds `weight * bm25 / best_bm25` to its cosine score;
+        lexical-only hits are appended with just that term, so exact tokens
+        surface even when the embedding misses them.
+        """
+        lcfg = self.cfg["memory"].get("lexical", {})
+        hits = self.lexical.search(query, top_k=lcfg.get("top_k", 30))
+        if not hits:
+            return lab, live, scores
+        weight = lcfg.get("weight", 0.3)
+        best = hits[0][1]
+        scores = scores.copy()
+        extra_lab, extra_score = [], []
+        dense_pos = {int(l): i for i, l in enumerate(lab) if live[i]}
+        for mid, s in hits:
+            label = self.vindex.label_of(mid)
+            if label < 0 or label >= len(self.vindex.columns.alive) or not self.vindex.columns.alive[label]:
+                continue
+            bonus = weight * s / best
+            i = dense_pos.get(label)
+            if i is not None:
+                scores[i] += bonus
+            else:
+                extra_lab.append(label)
+                extra_score.append(bonus)
+        if not extra_lab:
+            return lab, live, scores
+        return (np.concatenate([lab, np.asarray(extra_lab, dtype="int64")]),
+                np.concatenate([live, np.ones(len(extra_lab), dtype=bool)]),
+                np.concatenate([scores, np.asarray(extra_score, dtype="float64")]))
+
+    def _touch(self, hits):
+        # Bump the cached records now; the store catches up on the next flush
+        for m, _, _ in hits:
+            m.use_count += 1
+            m.last_used_turn = self.turn
+        self.usage.record([m.memory_id for m, _, _ in hits], self.turn)
+
+    def _retention_age(self):
+        cfgm = self.cfg["memory"]
+        max_age = cfgm["max_memory_age_turns"]
+        min_decay = self.retention.get("min_decay")
+        if min_decay and cfgm["decay_lambda"] > 0:
+            # exp(-lambda * age) < min_decay  <=>  age > ln(1 / min_decay) / lambda
+            max_age = min(max_age, math.log(1.0 / min_decay) / cfgm["decay_lambda"])
+        return max_age
+
+    def _retention_loop(self):
+        interval = float(self.retention.get("interval_s", 60))
+        while not self._stopping.wait(interval):
+            if not self.is_ready:
+                continue
+            try:
+                self.archive_expired()
+            except Exception as e:
+                print(f"⚠️ MemorySystem: retention pass failed: {e}")
+
+    def archive_expired(self):
+        """Archive every key whose current value is past the age (or decay)
+        cutoff: all its versions leave the store, cache and indexes.
+
+        Retrieval would filter these out anyway; archiving them frees index
+        slots and candidate budget. Returns the number of rows archived.
+        """
+        self.wait_ready()
+        max_age = self._retention_age()
+        with self._write_lock:
+            expired = [key for key, mid in self._current.items()
+                       if self.turn - self._memory_cache[mid].source_turn > max_age]
+            if not expired:
+                return 0
+            # Archived rows should carry their final usage counts
+            self.usage.flush()
+            n = self.store.archive_keys(expired, self.turn, compress=self.retention.get("compress", True))
+            mids = [self._current.pop(key) for key in expired]
+            for mid in mids:
+                self._memory_cache.pop(mid, None)
+                self._boosted.discard(mid)
+            self.vindex.remove(mids)
+            if self.lexical is not None:
+                self.lexical.remove(mids)
+            self._bump_epoch()
+        print(f"🗄️ MemorySystem: archived {n} memories ({len(expired)} expired keys).")
+        return n
+
+    def archived(self, mtype=None, key=None, limit=100):
+        """Read archived memories (newest archive first) as MemoryEntry."""
+        return [m.to_entry() for m in self.store.archived(mtype=mtype, key=key, limit=limit)]
+
+    def delete(self, memory_ids):
+        """Remove memories from the store, the cache and the vector index.
+
+        Deleting the current version of a key promotes the best remaining one.
+        """
+        self.wait_ready()
+        memory_ids = set(memory_ids)
+        with self._write_lock:
+            orphaned = [key for key, mid in self._current.items() if mid in memory_ids]
+            self.store.delete_many(memory_ids)
+            for mid in memory_ids:
+                self._memory_cache.pop(mid, None)
+                self._boosted.discard(mid)
+            self.vindex.remove(memory_ids)
+
+            promoted, changed = [], []
+            if orphaned:
+                # Promoted versions are re-read from the store; land their usage first
+                self.usage.flush()
+            for key in orphaned:
+                del self._current[key]
+                versions = self.store.versions(*key)
+                if not versions:
+                    continue
+                mid, boosted = self._resolve_current(versions)[key]
+                m = next(v for v in versions if v.memory_id == mid)
+                self._current[key] = mid
+                self._memory_cache[mid] = m
+                if boosted:
+                    self._boosted.add(mid)
+                promoted.append(m)
+                changed.append((key[0], key[1], mid, boosted))
+            gone = [key for key in orphaned if key not in self._current]
+            if gone:
+                self.store.delete_current(gone)
+            if changed:
+                self.store.upsert_many([], current=changed)
+            self.vindex.add_or_update(promoted)
+            if self.lexical is not None:
+                self.lexical.remove(memory_ids)
+                self.lexical.add_or_update(promoted)
+            self._bump_epoch()
+
+    def clear(self):
+        """Wipe all memories (store, cache, vector index and its snapshot)."""
+        self.wait_ready()
+        with self._write_lock:
+            self.store.clear()
+            self._memory_cache.clear()
+            self._current.clear()
+            self._boosted.clear()
+            self.vindex.clear()
+            if self.lexical is not None:
+                self.lexical.clear()
+            self.drop_snapshot()
+            self.turn = 0
+            self._bump_epoch()
 
-        return {"turn": self.turn, "retrieved": retrieved, "retrieve_ms": retrieve_ms, "injected_context": injected}
+    def memory_bytes(self):
+        """Rough resident size: the FAISS index plus ~2 KB per cached memory
+        (pydantic object, metadata columns, BM25 postings)."""
+        if not self.is_ready:
+            return 0
+        return self.vindex.memory_bytes() + 2048 * len(self._memory_cache)
 
     def close(self):
+        self._stopping.set()
+        if self._retention_thread is not None:
+            self._retention_thread.join(timeout=5)
+        if self._shared is None:
+            self._embed_pool.shutdown(wait=True)
+            self._search_pool.shutdown(wait=True)
+        self.usage.close()
+        # Don't pull the store out from under a background startup
+        self._ready.wait()
+        self.save_snapshot()
+        if self.vindex is not None:
+            self.vindex.close()
         self.store.close()
+        if self.embed_cache is not None and self._shared is None:
+            self.embed_cache.close()
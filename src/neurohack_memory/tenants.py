@@ -0,0 +1,173 @@
+import asyncio, copy, os, re, threading
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+from .system import MemorySystem
+
+TENANT_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+DEFAULT_TENANT = "default"
+
+def check_tenant_id(tenant_id):
+    # Tenant ids become directory names
+    if not TENANT_ID_RE.match(tenant_id or ""):
+        raise ValueError(f"Invalid tenant id '{tenant_id}'")
+
+class TenantManager:
+    """One MemorySystem per tenant, with LRU residency under a memory budget.
+
+    Each tenant gets its own SQLite file, vector/BM25 index and turn clock
+    under `tenants.root/<tenant_id>/`. The default tenant uses the configured
+    storage path, stays resident, and lends its embedding model, embedding
+    cache and thread pools to every other tenant. When more than
+    `max_resident` tenants are loaded, or their estimated size exceeds
+    `memory_budget_mb`, the least recently used idle tenants are closed
+    (which snapshots their index to disk) and reload lazily on next use.
+    """
+
+    def __init__(self, config, lazy=True):
+        self.cfg = config
+        tcfg = config.get("tenants", {})
+        self.root = tcfg.get("root", "artifacts/tenants")
+        self.max_resident = int(tcfg.get("max_resident", 32))
+        self.budget_bytes = int(float(tcfg.get("memory_budget_mb", 1024)) * 1024 * 1024)
+        self.default = MemorySystem(config, lazy=lazy)
+        self._resident = OrderedDict()   # tenant_id -> MemorySystem, oldest first
+        self._in_use = {}                # tenant_id -> active requests
+        self._closing = {}               # tenant_id -> thread closing it
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.evictions = 0
+
+    def _tenant_config(self, tenant_id):
+        cfg = copy.deepcopy(self.cfg)
+        cfg.setdefault("storage", {})["path"] = os.path.join(self.root, tenant_id, "memory.sqlite")
+        return cfg
+
+    def get(self, tenant_id=DEFAULT_TENANT, pin=False):
+        """The tenant's MemorySystem, loading it (in the background) if cold.
+
+        Prefer `use()`, which also keeps the tenant from being evicted while
+        a request is running against it. With `pin`, the tenant is pinned
+        under the same lock that hands it out; the caller must `_unpin()`.
+        """
+        if tenant_id == DEFAULT_TENANT:
+            if pin:
+                self._pin(tenant_id)
+            return self.default
+        check_tenant_id(tenant_id)
+        with self._lock:
+            s = self._resident.get(tenant_id)
+            if s is not None:
+                self._resident.move_to_end(tenant_id)
+                if pin:
+                    self._pin_locked(tenant_id)
+                return s
+            closing = self._closing.get(tenant_id)
+        if closing is not None:
+            # Its snapshot must be on disk before we reopen the same files
+            closing.join()
+        with self._lock:
+            s = self._resident.get(tenant_id)
+            if s is None:
+                os.makedirs(os.path.join(self.root, tenant_id), exist_ok=True)
+                s = MemorySystem(self._tenant_config(tenant_id), lazy=True, shared=self.default)
+                self._resident[tenant_id] = s
+                self.loads += 1
+            self._resident.move_to_end(tenant_id)
+            if pin:
+                self._pin_locked(tenant_id)
+        self._evict()
+        return s
+
+    def _pin_resident(self, tenant_id):
+        """The tenant's MemorySystem, pinned, if it is already resident."""
+        if tenant_id == DEFAULT_TENANT:
+            self._pin(tenant_id)
+            return self.default
+        with self._lock:
+            s = self._resident.get(tenant_id)
+            if s is not None:
+                self._resident.move_to_end(tenant_id)
+                self._pin_locked(tenant_id)
+            return s
+
+    def _pin_locked(self, tenant_id):
+        # Caller holds self._lock
+        self._in_use[tenant_id] = self._in_use.get(tenant_id, 0) + 1
+
+    def _pin(self, tenant_id):
+        with self._lock:
+            self._pin_locked(tenant_id)
+
+    def _unpin(self, tenant_id):
+        with self._lock:
+            self._in_use[tenant_id] -= 1
+            if not self._in_use[tenant_id]:
+                del self._in_use[tenant_id]
+
+    @contextmanager
+    def use(self, tenant_id=DEFAULT_TENANT):
+        s = self.get(tenant_id, pin=True)
+        try:
+            yield s
+        finally:
+            self._unpin(tenant_id)
+
+    @asynccontextmanager
+    async def ause(self, tenant_id=DEFAULT_TENANT):
+        """`use()` for async handlers: a cold load (building the
+        MemorySystem, or waiting for an eviction of the same tenant to
+        finish closing) runs in a worker thread, not on the event loop."""
+        s = self._pin_resident(tenant_id)
+        if s is None:
+            s = await asyncio.to_thread(self.get, tenant_id, True)
+        try:
+            yield s
+        finally:
+            self._unpin(tenant_id)
+
+    def resident_bytes(self):
+        return self.default.memory_bytes() + sum(s.memory_bytes() for s in list(self._resident.values()))
+
+    def _evict(self):
+        while True:
+            with self._lock:
+                over = len(self._resident) > self.max_resident or self.resident_bytes() > self.budget_bytes
+                idle = [tid for tid in self._resident if tid not in self._in_use]
+                # Always keep the most recently used tenant
+                if not over or len(idle) < 1 or idle[0] == next(reversed(self._resident)):
+                    return
+                tenant_id = idle[0]
+                s = self._resident.pop(tenant_id)
+                t = threading.Thread(target=self._close, args=(tenant_id, s), name=f"evict-{tenant_id}", daemon=True)
+                self._closing[tenant_id] = t
+                self.evictions += 1
+                t.start()
+
+    def _close(self, tenant_id, s):
+        try:
+            s.close()
+        except Exception as e:
+            print(f"⚠️ TenantManager: failed to close tenant '{tenant_id}': {e}")
+        finally:
+            with self._lock:
+                self._closing.pop(tenant_id, None)
+
+    def stats(self):
+        return {
+            "resident": len(self._resident) + 1,
+            "resident_mb": self.resident_bytes() / (1024 * 1024),
+            "budget_mb": self.budget_bytes / (1024 * 1024),
+            "loads": self.loads,
+            "evictions": self.evictions,
+        }
+
+    def close(self):
+        with self._lock:
+            resident = list(self._resident.items())
+            self._resident.clear()
+            closing = list(self._closing.values())
+        for t in closing:
+            t.join()
+        for tenant_id, s in resident:
+            self._close(tenant_id, s)
+        self.default.close()
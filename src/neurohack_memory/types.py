@@ -1,3 +1,4 @@
+import sys
 from pydantic import BaseModel, Field
 from enum import Enum
 from typing import Any, Dict, List, Optional
@@ -26,3 +27,43 @@ class RetrievedMemory(BaseModel):
     memory: MemoryEntry
     score: float
     ranker: str
+
+
+_TYPES = {t.value: t for t in MemoryType}
+
+class MemoryRecord:
+    """Slotted internal form of MemoryEntry: no validation and no per-object
+    dict. The hot cache and bulk loads from SQLite use these; MemoryEntry is
+    only built when a memory leaves MemorySystem.
+    """
+    __slots__ = ("memory_id", "type", "key", "value", "source_turn", "confidence",
+                 "source_text", "last_used_turn", "use_count", "meta")
+
+    def __init__(self, memory_id, type, key, value, source_turn, confidence, source_text="", last_used_turn=None, use_count=0, meta=None):
+        self.memory_id = memory_id
+        self.type = type
+        self.key = key
+        self.value = value
+        self.source_turn = source_turn
+        self.confidence = confidence
+        self.source_text = source_text
+        self.last_used_turn = last_used_turn
+        self.use_count = use_count
+        self.meta = meta or {}
+
+    @classmethod
+    def from_row(cls, r):
+        # Rows were validated on the way in; keys repeat across versions, so intern them
+        return cls(r[0], _TYPES[r[1]], sys.intern(r[2]), r[3], r[4], r[5], r[6] or "", r[7], r[8] or 0)
+
+    @classmethod
+    def from_entry(cls, m):
+        return cls(m.memory_id, m.type, sys.intern(m.key), m.value, m.source_turn, float(m.confidence),
+                   m.source_text, m.last_used_turn, m.use_count, m.meta)
+
+    def to_entry(self):
+        return MemoryEntry.model_construct(
+            memory_id=self.memory_id, type=self.type, key=self.key, value=self.value,
+            source_turn=self.source_turn, confidence=self.confidence, source_text=self.source_text,
+            last_used_turn=self.last_used_turn, use_count=self.use_count, meta=dict(self.meta),
+        )
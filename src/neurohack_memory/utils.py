@@ -1,4 +1,6 @@
-import os, time, yaml, math, re
+import os, time, yaml, math, re, threading
+from collections import deque
+from contextlib import contextmanager
 from dataclasses import dataclass
 from typing import Any, Dict
 from dotenv import load_dotenv
@@ -21,6 +23,60 @@ class Timer:
     def ms(self):
         return (time.perf_counter() - self.t0) * 1000.0
 
+class StageTimer:
+    """Named per-stage durations (ms) for one request."""
+    def __init__(self):
+        self.timings = {}
+    @contextmanager
+    def stage(self, name):
+        t = Timer.start()
+        try:
+            yield
+        finally:
+            self.add(name, t.ms())
+    def add(self, name, ms):
+        self.timings[name] = self.timings.get(name, 0.0) + ms
+
+# Upper bounds (ms) of the latency histogram buckets; the last one is open
+LATENCY_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+class LatencyHistograms:
+    """Rolling per-stage latency windows over the last `window` samples."""
+    def __init__(self, window=1000):
+        self.window = window
+        self._samples = {}
+        self._lock = threading.Lock()
+    def record(self, timings):
+        with self._lock:
+            for stage, ms in timings.items():
+                self._samples.setdefault(stage, deque(maxlen=self.window)).append(ms)
+    def percentile(self, stage, q, min_count=1):
+        """q-th percentile (ms) of `stage`, or None with fewer than `min_count` samples."""
+        import numpy as np
+        with self._lock:
+            d = self._samples.get(stage)
+            a = np.fromiter(d, dtype="float64") if d and len(d) >= min_count else None
+        return None if a is None else float(np.percentile(a, q))
+    def summary(self):
+        import numpy as np
+        with self._lock:
+            samples = {stage: np.fromiter(d, dtype="float64") for stage, d in self._samples.items()}
+        out = {}
+        for stage, a in samples.items():
+            counts = np.bincount(np.searchsorted(LATENCY_BUCKETS_MS, a), minlength=len(LATENCY_BUCKETS_MS) + 1)
+            labels = [f"<={b}" for b in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}"]
+            p50, p95, p99 = np.percentile(a, [50, 95, 99])
+            out[stage] = {
+                "count": int(len(a)),
+                "mean_ms": float(a.mean()),
+                "p50_ms": float(p50),
+                "p95_ms": float(p95),
+                "p99_ms": float(p99),
+                "max_ms": float(a.max()),
+                "histogram": {l: int(c) for l, c in zip(labels, counts) if c},
+            }
+        return out
+
 def exp_decay(age_turns, lam):
     return math.exp(-lam * max(age_turns, 0))
 
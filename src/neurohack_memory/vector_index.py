@@ -1,49 +1,530 @@
 from typing import List, Tuple
+import asyncio, os, json, threading
 import numpy as np
 import faiss
-from sentence_transformers import SentenceTransformer
 from .types import MemoryEntry
+from .embedder import load_embedder, BatchingEncoder
+from .embed_cache import QueryEmbeddingCache, normalize_query
+from .columns import LabelColumns
+
+INDEX_TYPES = ("flat", "hnsw", "ivf_flat", "ivf_pq")
+
+# Storage precision of vectors held by the index (IVF-PQ is already compressed)
+PRECISIONS = {
+    "float32": None,
+    "float16": faiss.ScalarQuantizer.QT_fp16,
+    "int8": faiss.ScalarQuantizer.QT_8bit,
+}
 
 class VectorIndex:
-    def __init__(self, model_name="all-MiniLM-L6-v2"):
-        self.model = SentenceTransformer(model_name)
+    def __init__(self, model_name="all-MiniLM-L6-v2", cache=None, compaction_threshold=0.2, index_cfg=None, precision="float32", backend="torch", threads=None, batching=None, query_cache=None, embedder=None):
+        self.model_name = model_name
+        self.cache = cache
+        # `embedder` is another index's .embedder: reuse its model, encoder and
+        # query cache instead of loading a second copy of the model
+        self._owns_encoder = embedder is None
+        if embedder is not None:
+            self.model, self.encoder, self.query_cache = embedder
+        else:
+            self.model = load_embedder(model_name, backend=backend, threads=threads)
+            batching = batching or {}
+            # All encode calls funnel through one worker so concurrent callers share a forward pass
+            self.encoder = self.model
+            if batching.get("enabled", True):
+                self.encoder = BatchingEncoder(
+                    self.model,
+                    max_batch=int(batching.get("max_batch", 64)),
+                    max_wait_ms=float(batching.get("max_wait_ms", 2.0)),
+                )
+            query_cache = query_cache or {}
+            self.query_cache = None
+            if query_cache.get("enabled", True):
+                self.query_cache = QueryEmbeddingCache(
+                    size=int(query_cache.get("size", 1024)),
+                    ttl_s=float(query_cache.get("ttl_s", 300)),
+                )
         self.dim = self.model.get_sentence_embedding_dimension()
-        self.index = faiss.IndexFlatIP(self.dim)
-        self.ids = []
-        self._mem_cache = []
+        self.compaction_threshold = compaction_threshold
+        self.index_cfg = index_cfg or {}
+        # Target backend; we start on an exact flat index and switch once the
+        # corpus is big enough for an ANN structure (and IVF has data to train on)
+        self.index_type = self.index_cfg.get("type", "flat")
+        if self.index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown vector.index.type '{self.index_type}', expected one of {INDEX_TYPES}")
+        self.switch_at = int(self.index_cfg.get("auto_switch_at", 20000))
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown vector.precision '{precision}', expected one of {tuple(PRECISIONS)}")
+        self.precision = precision
+        self._lock = threading.RLock()
+        self._compacting = False
+        self._migrating = False
+        self._journal = []
+        self._reset()
+
+    def _reset(self):
+        self.kind = "flat"
+        self.index = self._build("flat")
+        self._labels = {}    # memory_id -> live label
+        self._mids = {}      # live label -> memory_id
+        self._dead = set()   # tombstoned labels still physically in the FAISS index
+        self._next_label = 0
+        self.columns = LabelColumns()
+
+    # ------------------------------------------------------------------
+    # Backends
+    # ------------------------------------------------------------------
+    def _build(self, kind, train=None):
+        """Create an empty index of the given kind, addressed by int64 labels.
+
+        Flat and HNSW are wrapped in IndexIDMap2; IVF indexes carry ids in
+        their inverted lists natively (and support remove_ids that way).
+        """
+        qtype = PRECISIONS[self.precision]
+        if kind == "flat":
+            if qtype is None:
+                return faiss.IndexIDMap2(faiss.IndexFlatIP(self.dim))
+            sq = faiss.IndexScalarQuantizer(self.dim, qtype, faiss.METRIC_INNER_PRODUCT)
+            sq.train(self._unit_range())
+            return faiss.IndexIDMap2(sq)
+        if kind == "hnsw":
+            hcfg = self.index_cfg.get("hnsw", {})
+            if qtype is None:
+                hnsw = faiss.IndexHNSWFlat(self.dim, int(hcfg.get("M", 32)), faiss.METRIC_INNER_PRODUCT)
+            else:
+                hnsw = faiss.IndexHNSWSQ(self.dim, qtype, int(hcfg.get("M", 32)), faiss.METRIC_INNER_PRODUCT)
+                hnsw.train(self._unit_range())
+            hnsw.hnsw.efConstruction = int(hcfg.get("efConstruction", 200))
+            return faiss.IndexIDMap2(hnsw)
+
+        icfg = self.index_cfg.get("ivf", {})
+        n_train = 0 if train is None else len(train)
+        # FAISS wants ~39 points per centroid; shrink nlist on small corpora
+        nlist = max(1, min(int(icfg.get("nlist", 1024)), n_train // 39))
+        quantizer = faiss.IndexFlatIP(self.dim)
+        if kind == "ivf_flat" and qtype is None:
+            index = faiss.IndexIVFFlat(quantizer, self.dim, nlist, faiss.METRIC_INNER_PRODUCT)
+        elif kind == "ivf_flat":
+            index = faiss.IndexIVFScalarQuantizer(quantizer, self.dim, nlist, qtype, faiss.METRIC_INNER_PRODUCT)
+        else:
+            pcfg = self.index_cfg.get("pq", {})
+            m = int(pcfg.get("m", 48))
+            if self.dim % m:
+                raise ValueError(f"vector.index.pq.m={m} must divide embedding dim {self.dim}")
+            nbits = min(int(pcfg.get("nbits", 8)), max(1, int(np.log2(max(n_train // 39, 2)))))
+            index = faiss.IndexIVFPQ(quantizer, self.dim, nlist, m, nbits, faiss.METRIC_INNER_PRODUCT)
+        if train is not None:
+            index.train(train)
+        return index
+
+    def _unit_range(self):
+        # Embeddings are L2-normalized, so every component lies in [-1, 1];
+        # "training" the scalar quantizer on the two corners fixes that range
+        # without needing any data up front.
+        return np.stack([-np.ones(self.dim, dtype="float32"), np.ones(self.dim, dtype="float32")])
+
+    def _apply_search_params(self):
+        if self.kind == "hnsw":
+            ef = int(self.index_cfg.get("hnsw", {}).get("efSearch", 64))
+            faiss.downcast_index(self.index.index).hnsw.efSearch = ef
+        elif self.kind in ("ivf_flat", "ivf_pq"):
+            self.index.nprobe = int(self.index_cfg.get("ivf", {}).get("nprobe", 16))
+
+    def _live_vectors(self):
+        """(labels, vectors) of all live entries in an IDMap2-backed index."""
+        labels = faiss.vector_to_array(self.index.id_map).astype("int64")
+        vecs = self.index.index.reconstruct_n(0, self.index.ntotal)
+        keep = np.fromiter((int(l) in self._mids for l in labels), dtype=bool, count=len(labels))
+        return labels[keep], vecs[keep]
+
+    def _want_migration(self):
+        if self._migrating or self._compacting or self.kind != "flat" or self.index_type == "flat":
+            return False
+        n = len(self._labels)
+        if self.index_type.startswith("ivf"):
+            # Need enough vectors to train at least a handful of centroids
+            return n >= max(self.switch_at, 39 * 8)
+        return n >= self.switch_at
+
+    def migrate(self):
+        """Rebuild the live vectors into the configured ANN backend.
+
+        The new index is trained/built outside the lock; writes that land
+        meanwhile are journaled and replayed before the swap.
+        """
+        with self._lock:
+            labels, vecs = self._live_vectors()
+            self._journal = []
+        try:
+            kind = self.index_type
+            print(f"🔄 VectorIndex: switching flat -> {kind} at {len(labels)} vectors...")
+            index = self._build(kind, train=vecs if kind.startswith("ivf") else None)
+            index.add_with_ids(vecs, labels)
+            with self._lock:
+                present = set(labels.tolist())
+                for j_labels, j_vecs in self._journal:
+                    index.add_with_ids(j_vecs, j_labels)
+                    present.update(j_labels.tolist())
+                self.index = index
+                self.kind = kind
+                # Anything deleted mid-build stays tombstoned in the new index
+                self._dead = {l for l in present if l not in self._mids}
+                self._journal = []
+                self._apply_search_params()
+            print(f"✅ VectorIndex: now serving from {kind}.")
+        finally:
+            self._migrating = False
+
+    # ------------------------------------------------------------------
+    # Embedding
+    # ------------------------------------------------------------------
+    @property
+    def ids(self):
+        return list(self._labels)
 
-    def _embed(self, texts):
-        emb = self.model.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
+    def __len__(self):
+        return len(self._labels)
+
+    def _encode(self, texts):
+        emb = self.encoder.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
         return emb.astype("float32")
 
+    def _embed(self, texts, persist=True):
+        if self.cache is None or not texts:
+            return self._encode(texts)
+        # Only run the transformer on texts the embedding cache hasn't seen;
+        # persist=False (queries) stays in its RAM LRU, no SQLite read or write
+        out, missing = self._from_cache(texts, persist)
+        if missing:
+            self._fill(out, texts, missing, self._encode([texts[i] for i in missing]), persist)
+        return out
+
+    async def _aembed(self, texts):
+        """`_embed(texts, persist=False)` awaiting the micro-batching encoder."""
+        if self.cache is None:
+            return (await self.encoder.aencode(texts)).astype("float32", copy=False)
+        out, missing = self._from_cache(texts, False)
+        if missing:
+            emb = await self.encoder.aencode([texts[i] for i in missing])
+            self._fill(out, texts, missing, emb.astype("float32", copy=False), False)
+        return out
+
+    def _from_cache(self, texts, persist):
+        found, missing = self.cache.get_many(texts, disk=persist)
+        out = np.empty((len(texts), self.dim), dtype="float32")
+        for i, vec in found.items():
+            out[i] = vec
+        return out, missing
+
+    def _fill(self, out, texts, missing, emb, persist):
+        out[missing] = emb
+        self.cache.put_many([texts[i] for i in missing], emb, persist=persist)
+
+    def embed_queries(self, queries):
+        """Embed query strings, skipping the model for recently seen queries.
+
+        The cache is keyed on the normalized text, but the model always sees
+        the query as written (casefolding would change a cased model's output).
+        """
+        queries = list(queries)
+        out, missing = self._query_lookup(queries)
+        if missing:
+            # Queries only use the embedding cache's RAM LRU: the table holds
+            # memory texts, and the read path never touches SQLite
+            self._query_fill(out, missing, self._embed([queries[idxs[0]] for idxs in missing.values()], persist=False))
+        return out
+
+    async def aembed_queries(self, queries, executor=None):
+        """`embed_queries` for the event loop: cache lookups run inline and
+        misses are awaited on the micro-batching encoder, so concurrent
+        callers share one forward pass. Without batching the encode runs
+        on `executor`."""
+        queries = list(queries)
+        out, missing = self._query_lookup(queries)
+        if missing:
+            texts = [queries[idxs[0]] for idxs in missing.values()]
+            if isinstance(self.encoder, BatchingEncoder):
+                emb = await self._aembed(texts)
+            else:
+                emb = await asyncio.get_running_loop().run_in_executor(executor, self._embed, texts, False)
+            self._query_fill(out, missing, emb)
+        return out
+
+    def _query_lookup(self, queries):
+        """(embeddings so far, {cache key: [positions]} still to embed)."""
+        out = np.empty((len(queries), self.dim), dtype="float32")
+        missing = {}
+        for i, q in enumerate(queries):
+            if self.query_cache is None:
+                missing[i] = [i]
+                continue
+            key = normalize_query(q)
+            vec = self.query_cache.get(key)
+            if vec is None:
+                # One representative original text per normalized key
+                missing.setdefault(key, []).append(i)
+            else:
+                out[i] = vec
+        return out, missing
+
+    def _query_fill(self, out, missing, emb):
+        for (key, idxs), vec in zip(missing.items(), emb):
+            if self.query_cache is not None:
+                self.query_cache.put(key, vec)
+            out[idxs] = vec
+
+    # ------------------------------------------------------------------
+    # Mutation
+    # ------------------------------------------------------------------
     def add_or_update(self, memories: List[MemoryEntry]):
-        # Optimization: Incrementally add new memories instead of full rebuild
-        # This allows duplicates in the index, but retrieval deduplicates by ID.
-        self._mem_cache.extend(memories)
-        
-        # Keep track of IDs for later retrieval/BM25
-        self.ids.extend([m.memory_id for m in memories])
-        
-        new_texts = [f"{m.type.value}|{m.key}={m.value}" for m in memories]
-        if new_texts:
-            emb = self._embed(new_texts)
-            self.index.add(emb)
+        """Insert memories, replacing the vector of any memory_id already indexed."""
+        # Last write wins if the same memory_id appears twice in one batch
+        latest = {m.memory_id: m for m in memories}
+        if not latest:
+            return
+        new_texts = [f"{m.type.value}|{m.key}={m.value}" for m in latest.values()]
+        emb = self._embed(new_texts)
+        with self._lock:
+            self._tombstone(latest.keys())
+            labels = np.arange(self._next_label, self._next_label + len(latest), dtype="int64")
+            self._next_label += len(latest)
+            for mid, label in zip(latest, labels):
+                self._labels[mid] = int(label)
+                self._mids[int(label)] = mid
+            self.columns.set(labels, list(latest.values()))
+            self.index.add_with_ids(emb, labels)
+            if self._migrating or self._compacting:
+                self._journal.append((labels, emb))
+            migrate = self._want_migration()
+            if migrate:
+                self._migrating = True
+        if migrate:
+            threading.Thread(target=self.migrate, daemon=True).start()
+        self._maybe_compact()
+
+    def index_metadata(self, memories):
+        """Fill metadata columns for memories already in the index (after a snapshot load)."""
+        with self._lock:
+            known = [m for m in memories if m.memory_id in self._labels]
+            self.columns.set([self._labels[m.memory_id] for m in known], known)
+
+    def memory_id(self, label):
+        return self._mids.get(int(label))
 
+    def label_of(self, memory_id):
+        """FAISS label for an indexed memory_id, or -1."""
+        return self._labels.get(memory_id, -1)
+
+    def remove(self, memory_ids):
+        """Drop memories from search results. Vectors are tombstoned and
+        physically removed by the next compaction."""
+        with self._lock:
+            self._tombstone(memory_ids)
+        self._maybe_compact()
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+
+    @property
+    def embedder(self):
+        return self.model, self.encoder, self.query_cache
+
+    def memory_bytes(self):
+        """Approximate RAM held by the FAISS index."""
+        return self.index.ntotal * self.dim * {"float32": 4, "float16": 2}.get(self.precision, 1)
+
+    def close(self):
+        if self._owns_encoder and isinstance(self.encoder, BatchingEncoder):
+            self.encoder.close()
+
+    def _tombstone(self, memory_ids):
+        for mid in memory_ids:
+            label = self._labels.pop(mid, None)
+            if label is not None:
+                del self._mids[label]
+                self._dead.add(label)
+                self.columns.kill([label])
+
+    def _maybe_compact(self):
+        with self._lock:
+            total = self.index.ntotal
+            if self._compacting or self._migrating or not total or len(self._dead) / total < self.compaction_threshold:
+                return
+            self._compacting = True
+        threading.Thread(target=self.compact, daemon=True).start()
+
+    def compact(self):
+        """Physically remove tombstoned vectors from the FAISS index.
+
+        Like `migrate`, the replacement is built outside the lock (HNSW is
+        rebuilt from the live vectors, flat/IVF drop ids from a copy); adds
+        that land meanwhile are journaled and replayed before the swap.
+        """
+        try:
+            with self._lock:
+                if not self._dead or self._migrating:
+                    return
+                self._compacting = True
+                base, kind, dead = self.index, self.kind, set(self._dead)
+                self._journal = []
+                if kind == "hnsw":
+                    labels, vecs = self._live_vectors()
+                else:
+                    index = faiss.clone_index(self.index)
+            if kind == "hnsw":
+                # HNSW graphs can't delete nodes; rebuild from the live vectors
+                index = self._build("hnsw")
+                index.add_with_ids(vecs, labels)
+            else:
+                index.remove_ids(faiss.IDSelectorBatch(np.fromiter(dead, dtype="int64", count=len(dead))))
+            with self._lock:
+                if self.index is not base:
+                    # Cleared (or reloaded) mid-build
+                    return
+                for j_labels, j_vecs in self._journal:
+                    index.add_with_ids(j_vecs, j_labels)
+                self.index = index
+                # Labels tombstoned mid-build are still physically present
+                self._dead -= dead
+                self._journal = []
+                self._apply_search_params()
+        finally:
+            self._compacting = False
+
+    # ------------------------------------------------------------------
+    # Snapshots
+    # ------------------------------------------------------------------
+    def save(self, path):
+        """Snapshot the FAISS index + label->memory_id mapping next to the store.
+
+        On load, memories already in the mapping don't need re-embedding; the
+        caller diffs the mapping against the store's current memories.
+        """
+        with self._lock:
+            # Tombstones are saved as-is; compaction stays in the background
+            meta = {
+                "model": self.model_name,
+                "dim": self.dim,
+                "kind": self.kind,
+                "precision": self.precision,
+                "next_label": self._next_label,
+                "labels": self._labels,
+                "dead": sorted(self._dead),
+            }
+            # Write to temp files then rename, so a crash never leaves a torn snapshot
+            faiss.write_index(self.index, path + ".tmp")
+            with open(path + ".meta.json.tmp", "w") as f:
+                json.dump(meta, f)
+        os.replace(path + ".tmp", path)
+        os.replace(path + ".meta.json.tmp", path + ".meta.json")
+
+    def load(self, path):
+        """Load a snapshot written by `save`. Returns False if there is no
+        usable snapshot (missing, corrupt, or built with a
+        different embedding model, index type or precision)."""
+        return self.install(read_snapshot(path))
+
+    def install(self, snapshot):
+        """Adopt a snapshot returned by `read_snapshot` (None is a no-op); returns whether it was adopted."""
+        if snapshot is None:
+            return False
+        index, meta = snapshot
+        if meta.get("model") != self.model_name or int(meta.get("dim", -1)) != self.dim or index.d != self.dim:
+            print(f"⚠️ Index snapshot built with {meta.get('model')}/{meta.get('dim')}, ignoring.")
+            return False
+        if meta.get("precision", "float32") != self.precision:
+            print(f"⚠️ Index snapshot stored as {meta.get('precision', 'float32')}, config wants {self.precision}, ignoring.")
+            return False
+        kind = meta.get("kind", "flat")
+        if kind not in ("flat", self.index_type):
+            print(f"⚠️ Index snapshot is {kind} but config wants {self.index_type}, ignoring.")
+            return False
+        with self._lock:
+            self.index = index
+            self.kind = kind
+            self._labels = {mid: int(label) for mid, label in meta["labels"].items()}
+            self._mids = {label: mid for mid, label in self._labels.items()}
+            self._dead = set(meta.get("dead", []))
+            self._next_label = int(meta["next_label"])
+            # Metadata columns are refilled by index_metadata() once rows are loaded;
+            # sized to every label the snapshot can return, tombstoned ones included
+            self.columns = LabelColumns()
+            self.columns.reserve(self._next_label)
+            self._apply_search_params()
+            migrate = self._want_migration()
+            if migrate:
+                self._migrating = True
+        if migrate:
+            threading.Thread(target=self.migrate, daemon=True).start()
+        return True
+
+    # ------------------------------------------------------------------
+    # Search
+    # ------------------------------------------------------------------
     def search(self, query, top_k=10):
-        if not self.ids:
-            return []
-            
-        # Semantic search (FAISS is O(log N) or O(1) mostly)
-        q = self._embed([query])
-        
-        # Search for slightly more candidates to give reranker variety
-        k_search = min(top_k * 5, len(self.ids)) 
-        scores, idxs = self.index.search(q, k_search)
-        
-        # Return tuples (mid, score)
-        results = []
-        for score, idx in zip(scores[0], idxs[0]):
-            if idx >= 0:
-                results.append((self.ids[int(idx)], float(score)))
-                
-        return results
+        return self.search_many([query], top_k=top_k)[0]
+
+    def search_many(self, queries, top_k=10):
+        """Batched `search`: one encode call and one FAISS search for all queries."""
+        scores, labels = self.search_raw_many(queries, top_k=top_k)
+        mids = self._mids
+
+        # Return tuples (mid, score) per query
+        out = []
+        for row_scores, row_labels in zip(scores, labels):
+            results = []
+            for score, label in zip(row_scores, row_labels):
+                mid = mids.get(int(label))
+                if mid is not None:
+                    results.append((mid, float(score)))
+                    if len(results) >= top_k * 5:
+                        break
+            out.append(results)
+        return out
+
+    def search_raw_many(self, queries, top_k=10):
+        """Raw FAISS output for a batch of queries: (scores, labels) arrays.
+
+        Rows may contain tombstoned labels and -1 padding; callers mask them
+        with `columns.alive`. Each row has room for top_k*5 live hits.
+        """
+        if not self._labels or not queries:
+            return np.zeros((len(queries), 0), dtype="float32"), np.zeros((len(queries), 0), dtype="int64")
+
+        return self.search_vectors(self.embed_queries(queries), top_k)
+
+    def search_vectors(self, q, top_k=10):
+        """`search_raw_many` for already-embedded (normalized) query vectors."""
+        if not self._labels or not len(q):
+            return np.zeros((len(q), 0), dtype="float32"), np.zeros((len(q), 0), dtype="int64")
+
+        # Flat: exact O(N·d) scan. HNSW/IVF: approximate, sub-linear in N.
+        with self._lock:
+            # Search for slightly more candidates to give reranker variety,
+            # plus headroom for tombstones that haven't been compacted yet
+            k_search = min(top_k * 5 + len(self._dead), self.index.ntotal)
+            return self.index.search(q, k_search)
+
+
+def read_snapshot(path):
+    """Read an index snapshot from disk without needing the embedding model.
+
+    Returns (faiss index, meta) or None. Kept separate from VectorIndex so
+    startup can read the snapshot while the model is still loading.
+    """
+    if not (os.path.exists(path) and os.path.exists(path + ".meta.json")):
+        return None
+    try:
+        with open(path + ".meta.json") as f:
+            meta = json.load(f)
+        if "labels" not in meta:
+            print("⚠️ Index snapshot uses an old format, ignoring.")
+            return None
+        index = faiss.read_index(path)
+        if index.ntotal != len(meta["labels"]) + len(meta.get("dead", [])):
+            print("⚠️ Index snapshot is inconsistent, ignoring.")
+            return None
+    except Exception as e:
+        print(f"⚠️ Failed to load index snapshot: {e}")
+        return None
+    return index, meta